@@ -0,0 +1,173 @@
+"""
+Analysis of many positions over a pool of processes, each keeping one engine (and its transposition table)
+for all the positions it is given
+
+    python -m heuristic_agent.analysis fens.txt --depth 4 --workers 8 --output analysis.jsonl
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+import types
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+from heuristic_agent.engines.alphabeta_cached import ABCachedEngine
+from heuristic_agent.engines.alphabeta_cached_iterdeep import ABIterDeepEngine
+from heuristic_agent.engines.base import Engine
+from heuristic_agent.env.board import ChessBoard
+
+# engine of the current worker process, built once by _init_worker
+_engine: Optional[Engine] = None
+_movetime: Optional[float] = None
+
+
+def analyze(engine: Engine, fen: str, movetime: Optional[float] = None) -> Dict:
+    """
+    Search a position with the engine
+    :param engine: engine to search with, its transposition table is kept from one position to the next
+    :param fen: position to search
+    :param movetime: seconds of the search, for the iterative deepening engines (ABIterDeepEngine and subclasses):
+        it becomes their soft and hard time limits, no iteration predicted to end later is started and the search
+        is aborted when it is reached
+    :return: fen, best move, score, principal variation, nodes, depth and time of the search
+    :raises ValueError: if movetime is given for an engine without time limits
+    """
+    if movetime is not None:
+        if not isinstance(engine, ABIterDeepEngine):
+            raise ValueError('movetime needs an iterative deepening engine with time limits, got %s' % engine)
+        engine.set_limits(soft_time=movetime, hard_time=movetime)
+    start = time.time()
+    board = ChessBoard(fen)
+    move = engine.choose(board)
+    nodes = 0
+    if isinstance(move, types.GeneratorType):
+        # iterative deepening: keep the last move yielded
+        iterations = move
+        for move in iterations:
+            pass
+        nodes = engine._searched
+    else:
+        nodes = engine.stats.get('nodes', 0)
+    if isinstance(move, tuple):
+        # GreedyEngine returns the score along with the move
+        move = move[0]
+    stats = engine.stats
+    return {
+        'fen': fen,
+        'move': move.uci() if move else None,
+        'score': stats.get('score'),
+        'pv': stats['pv'].split(', ') if stats.get('pv') else [],
+        'nodes': nodes,
+        'depth': stats.get('depth', getattr(engine, '_maxdepth', None)),
+        'time': time.time() - start,
+    }
+
+
+def _init_worker(engine_factory: Callable[..., Engine], depth: int, engine_kwargs: Dict, movetime: Optional[float]):
+    global _engine, _movetime
+    _engine = engine_factory(depth, **engine_kwargs)
+    _engine.verbose = False
+    _movetime = movetime
+
+
+def _analyze(fen: str) -> Dict:
+    return analyze(_engine, fen, _movetime)
+
+
+def done_fens(path: str) -> set:
+    """FENs already analyzed in a JSON-lines output file, a truncated last line is ignored"""
+    fens = set()
+    if not os.path.exists(path):
+        return fens
+    with open(path) as file:
+        for line in file:
+            try:
+                fens.add(json.loads(line)['fen'])
+            except (ValueError, KeyError):
+                continue
+    return fens
+
+
+def analyze_many(fens: Iterable[str],
+                 engine_factory: Callable[..., Engine] = ABCachedEngine,
+                 depth=4,
+                 movetime: Optional[float] = None,
+                 workers: Optional[int] = None,
+                 chunksize=8,
+                 output: Optional[str] = None,
+                 **engine_kwargs) -> Iterator[Dict]:
+    """
+    Analyze positions over a pool of processes and stream the results as they complete, in any order.
+    Each worker builds its engine once with engine_factory(depth, **engine_kwargs) and reuses it, with its
+    transposition table, for all its positions; its statistics are not printed.
+
+    :param fens: positions to analyze
+    :param engine_factory: engine class, or picklable function building the engine from the depth and engine_kwargs
+    :param depth: maximum depth of the searches
+    :param movetime: seconds per position, for iterative deepening engines only, see analyze
+    :param workers: number of processes, os.cpu_count() if None; 1 analyzes in the calling process
+    :param chunksize: number of positions sent to a worker at once
+    :param output: JSON-lines file the results are appended to; positions already in it are skipped, so that an
+        interrupted analysis resumes where it stopped
+    :return: iterator over the results of analyze
+    """
+    if output is not None:
+        done = done_fens(output)
+        fens = (fen for fen in fens if fen not in done)
+    initargs = (engine_factory, depth, engine_kwargs, movetime)
+    if workers == 1:
+        _init_worker(*initargs)
+        results = map(_analyze, fens)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=initargs)
+        results = pool.imap_unordered(_analyze, fens, chunksize)
+
+    file = None
+    if output is not None:
+        file = open(output, 'a+')
+        end = file.tell()
+        if end:
+            file.seek(end - 1)
+            if file.read(1) != '\n':
+                # the last result was cut short, start on a new line
+                file.write('\n')
+    try:
+        for res in results:
+            if file is not None:
+                file.write(json.dumps(res) + '\n')
+                file.flush()
+            yield res
+    finally:
+        if file is not None:
+            file.close()
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
+if __name__ == "__main__":
+    from heuristic_agent.benchmarks.eval_backends import ENGINES
+    from heuristic_agent.engines.mtdf import MTDfEngine
+
+    ENGINES = dict(ENGINES, iterdeep=ABIterDeepEngine, mtdf=MTDfEngine)
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('fens', help='file with one FEN per line')
+    parser.add_argument('--engine', choices=ENGINES, default='abcached')
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--movetime', type=float, help='seconds per position, for the iterdeep and mtdf engines')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--chunksize', type=int, default=8)
+    parser.add_argument('--output', help='JSON-lines file, resumed if it exists')
+    parser.add_argument('--evaluation', default='classic')
+    args = parser.parse_args()
+    if args.movetime is not None and not issubclass(ENGINES[args.engine], ABIterDeepEngine):
+        parser.error('--movetime is only supported by the iterdeep and mtdf engines')
+
+    with open(args.fens) as f:
+        positions = [line.strip() for line in f if line.strip()]
+    for result in analyze_many(positions, ENGINES[args.engine], args.depth, args.movetime, args.workers,
+                               args.chunksize, args.output, evaluation=args.evaluation):
+        if args.output is None:
+            print(json.dumps(result))
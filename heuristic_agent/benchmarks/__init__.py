@@ -0,0 +1,30 @@
+import random
+from typing import List
+
+from heuristic_agent.env.board import ChessBoard
+
+# position used throughout notebook.ipynb
+STANDARD_FEN = "rnbqkb1r/pp2pppp/3p1n2/2p5/4P3/2PB1N2/PP1P1PPP/RNBQK2R w kq - 0 6"
+STANDARD_FEN_BLACK = "rnbqkb1r/pp2pppp/3p1n2/2p5/4P3/2PB1N2/PP1P1PPP/RNBQK2R b kq - 0 6"
+
+
+def random_positions(n: int, seed=0, fen=STANDARD_FEN, maxplies=80) -> List[ChessBoard]:
+    """
+    Generate a reproducible corpus of positions by playing random games from the given position
+    :param n: number of positions
+    :param seed: seed of the random generator
+    :param fen: starting position of every game
+    :param maxplies: length of a game before starting a new one
+    :return: list of boards, each holding the moves played from fen
+    """
+    rng = random.Random(seed)
+    boards = []
+    board = ChessBoard(fen)
+    while len(boards) < n:
+        moves = board.moves
+        if not moves or len(board.move_stack) >= maxplies:
+            board = ChessBoard(fen)
+            continue
+        board.push(rng.choice(moves))
+        boards.append(board.copy())
+    return boards
@@ -0,0 +1,43 @@
+"""
+Nodes per second of a search engine with each evaluation backend
+
+    python -m heuristic_agent.benchmarks.eval_backends --depth 5
+"""
+import argparse
+
+from heuristic_agent.benchmarks import STANDARD_FEN
+from heuristic_agent.engines.alphabeta import AlphaBetaEngine
+from heuristic_agent.engines.alphabeta_cached import ABCachedEngine
+from heuristic_agent.engines.negamax import NegamaxEngine
+from heuristic_agent.env.board import ChessBoard
+from heuristic_agent.env.eval import EVALUATORS
+
+ENGINES = {
+    'negamax': NegamaxEngine,
+    'alphabeta': AlphaBetaEngine,
+    'abcached': ABCachedEngine,
+}
+
+
+def run(engine_name='abcached', depth=5, fen=STANDARD_FEN, evaluations=tuple(EVALUATORS)):
+    results = {}
+    for evaluation in evaluations:
+        engine = ENGINES[engine_name](depth, evaluation=evaluation)
+        move = engine.choose(ChessBoard(fen))
+        stats = engine.stats
+        results[evaluation] = {'move': move.uci(), 'score': stats['score'], 'nodes': stats['nodes'],
+                               'time': stats['time'], 'nps': stats['nps']}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--engine', choices=ENGINES, default='abcached')
+    parser.add_argument('--depth', type=int, default=5)
+    parser.add_argument('--fen', default=STANDARD_FEN)
+    args = parser.parse_args()
+
+    results = run(args.engine, args.depth, args.fen)
+    for evaluation, res in results.items():
+        print('{:<12} move: {move}, score: {score}, nodes: {nodes}, time: {time:0.3f}s, nps: {nps:0.0f}'.format(
+            evaluation, **res))
@@ -0,0 +1,43 @@
+"""
+Throughput of the vectorized evaluate_batch against one evaluate call per board
+
+    python -m heuristic_agent.benchmarks.eval_batch --positions 20000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from heuristic_agent.benchmarks import random_positions
+from heuristic_agent.env.eval import evaluate, evaluate_batch
+
+
+def run(nb_positions: int, seed=0):
+    boards = random_positions(nb_positions, seed)
+
+    start = time.perf_counter()
+    scalar = np.array([evaluate(board) for board in boards])
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = evaluate_batch(boards)
+    batch_time = time.perf_counter() - start
+
+    assert np.array_equal(scalar, batch), 'evaluate_batch differs from evaluate'
+    return {
+        'positions': nb_positions,
+        'scalar_pps': nb_positions / scalar_time,
+        'batch_pps': nb_positions / batch_time,
+        'speedup': scalar_time / batch_time,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--positions', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    res = run(args.positions, args.seed)
+    print('positions: {positions}\nscalar: {scalar_pps:.0f} pos/s\nbatch: {batch_pps:.0f} pos/s\n'
+          'speedup: {speedup:.2f}x'.format(**res))
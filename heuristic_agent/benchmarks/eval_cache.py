@@ -0,0 +1,53 @@
+"""
+Check of the EvalCache and the pawn hash against the uncached evaluation, pawnless positions included
+
+    python -m heuristic_agent.benchmarks.eval_cache --positions 20000
+"""
+import argparse
+import sys
+
+from heuristic_agent.benchmarks import random_positions
+from heuristic_agent.enhancements.eval_cache import EvalCache
+from heuristic_agent.env.board import ChessBoard
+from heuristic_agent.env.eval import evaluate_pawns_white, evaluate_white, with_pawn_structure
+
+# pawnless positions, whose pawnkey is 0
+PAWNLESS_FENS = (
+    "4k3/8/8/8/8/8/8/R3K3 w - - 0 1",
+    "4k3/8/8/8/8/8/8/R3K3 b - - 0 1",
+    "3qk3/8/8/8/8/8/8/3QK1N1 w - - 0 1",
+    "4k3/8/8/8/8/8/8/4K3 w - - 0 1",
+)
+
+
+def run(nb_positions: int, seed=0, size_mb=1):
+    """
+    Evaluate every position twice through the caches, so that the second call is a hit
+    :return: number of positions compared and list of (fen, cached, reference) of the mismatches
+    """
+    boards = [ChessBoard(fen) for fen in PAWNLESS_FENS] + random_positions(nb_positions, seed)
+    reference = with_pawn_structure(evaluate_white, evaluate_pawns_white)
+    pawncache = EvalCache(evaluate_pawns_white, size_mb, key='pawnkey')
+    cached = EvalCache(with_pawn_structure(evaluate_white, pawncache), size_mb)
+    mismatches = []
+    for _ in range(2):
+        for board in boards:
+            expected, score = reference(board), cached(board)
+            if score != expected:
+                mismatches.append((board.fen(), score, expected))
+    return len(boards), mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--positions', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--size-mb', type=int, default=1)
+    args = parser.parse_args()
+
+    positions, mismatches = run(args.positions, args.seed, args.size_mb)
+    for fen, score, expected in mismatches[:10]:
+        print('MISMATCH cached: {} uncached: {} [{}]'.format(score, expected, fen))
+    print('positions: {}, mismatches: {}'.format(positions, len(mismatches)))
+    if mismatches:
+        sys.exit(1)
@@ -0,0 +1,73 @@
+"""
+Check of evaluate_white_incremental against evaluate_white over seeded random push/pop sequences
+
+    python -m heuristic_agent.benchmarks.eval_incremental --games 200
+"""
+import argparse
+import random
+import sys
+
+from heuristic_agent.benchmarks import STANDARD_FEN, STANDARD_FEN_BLACK
+from heuristic_agent.env.board import ChessBoard
+from heuristic_agent.env.eval import evaluate_white, evaluate_white_incremental
+
+# starting positions covering castling, en passant, promotions and the switch to the end game tables
+FENS = (
+    STANDARD_FEN,
+    STANDARD_FEN_BLACK,
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3",
+    "n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1",
+    "4k3/1P6/8/8/8/8/6p1/4K3 w - - 0 1",
+    "3qk3/8/8/8/8/8/8/3QK1N1 w - - 0 1",
+)
+
+
+def check(board: ChessBoard, mismatches: list):
+    incremental, reference = evaluate_white_incremental(board), evaluate_white(board)
+    if incremental != reference:
+        mismatches.append((board.fen(), [move.uci() for move in board.move_stack], incremental, reference))
+
+
+def run(nb_games: int, seed=0, fens=FENS, maxplies=80, popprob=0.2):
+    """
+    Play random games from every fen, popping back up to three moves with probability popprob at every ply,
+    and compare both evaluations at every position reached, after the pops included
+    :return: number of positions compared and list of (fen, moves, incremental, reference) of the mismatches
+    """
+    rng = random.Random(seed)
+    mismatches = []
+    positions = 0
+    for game in range(nb_games):
+        board = ChessBoard(fens[game % len(fens)])
+        check(board, mismatches)
+        positions += 1
+        while len(board.move_stack) < maxplies:
+            if board.move_stack and rng.random() < popprob:
+                for _ in range(min(rng.randint(1, 3), len(board.move_stack))):
+                    board.pop()
+            else:
+                moves = board.moves
+                if not moves:
+                    break
+                board.push(rng.choice(moves))
+            check(board, mismatches)
+            positions += 1
+    return positions, mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--maxplies', type=int, default=80)
+    args = parser.parse_args()
+
+    positions, mismatches = run(args.games, args.seed, maxplies=args.maxplies)
+    for fen, moves, incremental, reference in mismatches[:10]:
+        print('MISMATCH incremental: {} evaluate_white: {} [{}] moves: {}'.format(
+            incremental, reference, fen, ' '.join(moves)))
+    print('positions: {}, mismatches: {}'.format(positions, len(mismatches)))
+    if mismatches:
+        sys.exit(1)
@@ -0,0 +1,53 @@
+"""
+Time-to-depth speedup of the Lazy SMP search of ABIterDeepEngine against the number of worker processes
+
+    python -m heuristic_agent.benchmarks.lazy_smp --depth 5 --workers 1 2 4 8
+
+A helper failing, e.g. on a board that does not survive pickling under --start-method spawn, raises HelperError
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import time
+
+from heuristic_agent.benchmarks import STANDARD_FEN
+from heuristic_agent.engines.alphabeta_cached_iterdeep import ABIterDeepEngine
+from heuristic_agent.env.board import ChessBoard
+
+
+def time_to_depth(workers: int, depth=5, fen=STANDARD_FEN, **kwargs):
+    engine = ABIterDeepEngine(depth, workers=workers, **kwargs)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for move in engine.choose(ChessBoard(fen)):
+            pass
+    elapsed = time.perf_counter() - start
+    stats = engine.stats
+    return {'workers': workers, 'move': move.uci(), 'score': stats['score'], 'time': elapsed,
+            'nodes': sum(stats.get('workernodes', [stats['nodes']]))}
+
+
+def run(workers=(1, 2, 4), depth=5, fen=STANDARD_FEN, **kwargs):
+    results = [time_to_depth(n, depth, fen, **kwargs) for n in workers]
+    for res in results:
+        res['speedup'] = results[0]['time'] / res['time']
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--depth', type=int, default=5)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--fen', default=STANDARD_FEN)
+    parser.add_argument('--evaluation', default='incremental')
+    parser.add_argument('--hash-mb', type=int, default=64)
+    parser.add_argument('--start-method', choices=multiprocessing.get_all_start_methods(),
+                        help='start method of the helpers, the platform default if not given')
+    args = parser.parse_args()
+
+    mp_context = multiprocessing.get_context(args.start_method) if args.start_method else None
+    for res in run(args.workers, args.depth, args.fen, evaluation=args.evaluation, hash_mb=args.hash_mb,
+                   mp_context=mp_context):
+        print('workers: {workers:<3} move: {move}, score: {score}, time: {time:0.3f}s, nodes: {nodes}, '
+              'speedup: {speedup:0.2f}'.format(**res))
@@ -0,0 +1,50 @@
+"""
+Quality and cost of the 'cache' move ordering: share of the beta cutoffs produced by the first move searched
+by ABCachedEngine, and time to order the moves of a position
+
+    python -m heuristic_agent.benchmarks.move_ordering --depth 4 --positions 20
+"""
+import argparse
+import time
+
+from heuristic_agent.benchmarks import random_positions
+from heuristic_agent.engines.alphabeta_cached import ABCachedEngine
+
+
+def cutoffs(boards, depth=4, **kwargs):
+    betacuts = firstcuts = nodes = 0
+    for board in boards:
+        engine = ABCachedEngine(depth, verbose=False, **kwargs)
+        engine.choose(board.copy())
+        stats = engine.stats
+        betacuts += stats['betacuts']
+        firstcuts += stats['firstcuts']
+        nodes += stats['nodes']
+    return {'nodes': nodes, 'betacuts': betacuts, 'firstcutrate': firstcuts / betacuts if betacuts else 0.}
+
+
+def ordering_cost(boards, repeat=5):
+    """Mean time in microseconds to generate every move of a position in the order of the search"""
+    engine = ABCachedEngine(1, verbose=False)
+    order = engine.moveorder.order
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for board in boards:
+            for _ in order(board, 0):
+                pass
+    return (time.perf_counter() - start) / (repeat * len(boards)) * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--positions', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--quiescence', action='store_true')
+    args = parser.parse_args()
+
+    boards = [board for board in random_positions(args.positions * 10, args.seed) if not board.is_game_over()]
+    boards = boards[::10][:args.positions]
+    res = cutoffs(boards, args.depth, evaluation='incremental', quiescence=args.quiescence)
+    print('nodes: {nodes}, betacuts: {betacuts}, first move cutoffs: {firstcutrate:0.1%}'.format(**res))
+    print('ordering: {:0.1f} us per position'.format(ordering_cost(random_positions(1000, args.seed + 1))))
@@ -0,0 +1,65 @@
+"""
+Nodes and time to depth of MTDfEngine against ABIterDeepEngine with and without principal variation search,
+on the positions of notebook.ipynb and random positions
+
+    python -m heuristic_agent.benchmarks.mtdf --depth 5 --positions 10
+"""
+import argparse
+import time
+from collections import OrderedDict
+
+from heuristic_agent.benchmarks import STANDARD_FEN, STANDARD_FEN_BLACK, random_positions
+from heuristic_agent.engines.alphabeta_cached_iterdeep import ABIterDeepEngine
+from heuristic_agent.engines.mtdf import MTDfEngine
+from heuristic_agent.env.board import ChessBoard
+
+CONFIGS = OrderedDict([
+    ('alphabeta', (ABIterDeepEngine, {})),
+    ('pvs', (ABIterDeepEngine, {'pvs': True})),
+    ('mtdf', (MTDfEngine, {})),
+])
+
+
+def nodes_to_depth(engine_cls, depth: int, fen: str, **kwargs):
+    engine = engine_cls(depth, verbose=False, **kwargs)
+    start = time.perf_counter()
+    for move in engine.choose(ChessBoard(fen)):
+        pass
+    stats = engine.stats
+    return {'move': move.uci(), 'score': stats['score'], 'nodes': engine._searched,
+            'time': time.perf_counter() - start, 'passes': stats.get('passesperdepth')}
+
+
+def run(depth=5, fens=(STANDARD_FEN, STANDARD_FEN_BLACK), configs=tuple(CONFIGS), evaluation='incremental'):
+    results = []
+    for fen in fens:
+        for name in configs:
+            engine_cls, kwargs = CONFIGS[name]
+            res = nodes_to_depth(engine_cls, depth, fen, evaluation=evaluation, **kwargs)
+            res.update(fen=fen, config=name)
+            results.append(res)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--depth', type=int, default=5)
+    parser.add_argument('--positions', type=int, default=0, help='number of random positions to add')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--configs', nargs='+', choices=CONFIGS, default=list(CONFIGS))
+    parser.add_argument('--evaluation', default='incremental')
+    parser.add_argument('--verbose', action='store_true', help='print the result of every position')
+    args = parser.parse_args()
+
+    fens = [STANDARD_FEN, STANDARD_FEN_BLACK]
+    boards = [board for board in random_positions(args.positions * 10, args.seed) if not board.is_game_over()]
+    fens += [board.fen() for board in boards[::10][:args.positions]]
+    totals = OrderedDict((name, {'nodes': 0, 'time': 0.}) for name in args.configs)
+    for res in run(args.depth, fens, args.configs, args.evaluation):
+        totals[res['config']]['nodes'] += res['nodes']
+        totals[res['config']]['time'] += res['time']
+        if args.verbose:
+            print('{config:<10} move: {move}, score: {score}, nodes: {nodes}, time: {time:0.3f}s, '
+                  'passes: {passes} [{fen}]'.format(**res))
+    for name, total in totals.items():
+        print('{:<10} nodes: {nodes}, time: {time:0.3f}s'.format(name, **total))
@@ -0,0 +1,141 @@
+"""
+Perft benchmark of the board layer: node counts checked against known values and nodes per second of
+legal move generation, pseudo-legal generation with lazy legality checks, and make/unmake
+
+    python -m heuristic_agent.benchmarks.perft --depth 3 --json perft.json
+"""
+import argparse
+import json
+import sys
+import time
+from collections import OrderedDict
+
+import chess
+
+from heuristic_agent.env.board import ChessBoard
+
+# https://www.chessprogramming.org/Perft_Results
+POSITIONS = OrderedDict([
+    ('startpos', (chess.STARTING_FEN,
+                  [20, 400, 8902, 197281, 4865609])),
+    ('kiwipete', ('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+                  [48, 2039, 97862, 4085603])),
+    ('enpassant', ('8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+                   [14, 191, 2812, 43238, 674624])),
+    ('promotion', ('r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+                   [6, 264, 9467, 422333])),
+    ('underpromotion', ('rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+                        [44, 1486, 62379, 2103487])),
+    ('middlegame', ('r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+                    [46, 2079, 89890, 3894594])),
+])
+
+
+def perft_legal(board: ChessBoard, depth: int) -> int:
+    """perft with legal move generation, leaves are counted in bulk on the last ply"""
+    moves = list(board.generate_legal_moves())
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for m in moves:
+        board.make(m)
+        nodes += perft_legal(board, depth - 1)
+        board.unmake()
+    return nodes
+
+
+def perft_pseudo(board: ChessBoard, depth: int) -> int:
+    """perft with pseudo-legal move generation, the legality of a move is checked when it is counted or played"""
+    is_legal = board.legality_check()
+    nodes = 0
+    for m in board.generate_pseudo_legal_moves():
+        if not is_legal(m):
+            continue
+        if depth == 1:
+            nodes += 1
+        else:
+            board.make(m)
+            nodes += perft_pseudo(board, depth - 1)
+            board.unmake()
+    return nodes
+
+
+class _MakeUnmakeTimer:
+    def __init__(self):
+        self.elapsed = 0.
+        self.moves = 0
+
+    def perft(self, board: ChessBoard, depth: int) -> int:
+        """perft making and unmaking every move down to the leaves, only the time spent in make/unmake is kept"""
+        if depth == 0:
+            return 1
+        nodes = 0
+        clock = time.perf_counter
+        moves = list(board.generate_legal_moves())
+        for m in moves:
+            start = clock()
+            board.make(m)
+            self.elapsed += clock() - start
+            nodes += self.perft(board, depth - 1)
+            start = clock()
+            board.unmake()
+            self.elapsed += clock() - start
+        self.moves += len(moves)
+        return nodes
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    res = fn(*args)
+    return res, time.perf_counter() - start
+
+
+def run(names=tuple(POSITIONS), depth=3):
+    if depth < 1:
+        raise ValueError('depth must be at least 1, got %s' % depth)
+    results = []
+    for name in names:
+        fen, expected = POSITIONS[name]
+        d = min(depth, len(expected))
+
+        nodes, legal_time = _timed(perft_legal, ChessBoard(fen), d)
+        pseudo_nodes, pseudo_time = _timed(perft_pseudo, ChessBoard(fen), d)
+        timer = _MakeUnmakeTimer()
+        made_nodes = timer.perft(ChessBoard(fen), d)
+
+        results.append({
+            'position': name,
+            'fen': fen,
+            'depth': d,
+            'nodes': nodes,
+            'expected': expected[d - 1],
+            'ok': nodes == pseudo_nodes == made_nodes == expected[d - 1],
+            'legal_nps': nodes / legal_time,
+            'pseudo_nps': pseudo_nodes / pseudo_time,
+            'makeunmake_nps': timer.moves / timer.elapsed,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--positions', nargs='+', choices=POSITIONS, default=list(POSITIONS))
+    parser.add_argument('--json', help='write the results to this file, - for stdout')
+    args = parser.parse_args()
+    if args.depth < 1:
+        parser.error('--depth must be at least 1')
+
+    results = run(args.positions, args.depth)
+    if args.json == '-':
+        json.dump(results, sys.stdout, indent=2)
+    else:
+        for res in results:
+            print('{position:<15} depth: {depth}, nodes: {nodes} [{status}], legal: {legal_nps:0.0f} nps, '
+                  'pseudo: {pseudo_nps:0.0f} nps, make/unmake: {makeunmake_nps:0.0f} nps'.format(
+                      status='ok' if res['ok'] else 'expected %s' % res['expected'], **res))
+        if args.json:
+            with open(args.json, 'w') as file:
+                json.dump(results, file, indent=2)
+    if not all(res['ok'] for res in results):
+        sys.exit(1)
@@ -0,0 +1,56 @@
+"""
+Nodes to depth of ABIterDeepEngine with principal variation search and aspiration windows, on the positions
+of notebook.ipynb
+
+    python -m heuristic_agent.benchmarks.search_windows --depth 6
+"""
+import argparse
+import time
+from collections import OrderedDict
+
+from heuristic_agent.benchmarks import STANDARD_FEN, STANDARD_FEN_BLACK
+from heuristic_agent.engines.alphabeta_cached_iterdeep import ABIterDeepEngine
+from heuristic_agent.env.board import ChessBoard
+
+CONFIGS = OrderedDict([
+    ('alphabeta', {}),
+    ('pvs', {'pvs': True}),
+    ('aspiration', {'aspiration': 50}),
+    ('pvs+aspiration', {'pvs': True, 'aspiration': 50}),
+])
+
+
+def nodes_to_depth(depth: int, fen: str, **kwargs):
+    engine = ABIterDeepEngine(depth, verbose=False, **kwargs)
+    start = time.perf_counter()
+    for move in engine.choose(ChessBoard(fen)):
+        pass
+    stats = engine.stats
+    return {'move': move.uci(), 'score': stats['score'], 'nodes': engine._searched,
+            'time': time.perf_counter() - start, 'researches': stats['researches'], 'aspfails': stats['aspfails']}
+
+
+def run(depth=5, fens=(STANDARD_FEN, STANDARD_FEN_BLACK), configs=tuple(CONFIGS), evaluation='incremental'):
+    results = []
+    for fen in fens:
+        for name in configs:
+            res = nodes_to_depth(depth, fen, evaluation=evaluation, **CONFIGS[name])
+            res.update(fen=fen, config=name)
+            results.append(res)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--depth', type=int, default=5)
+    parser.add_argument('--configs', nargs='+', choices=CONFIGS, default=list(CONFIGS))
+    parser.add_argument('--evaluation', default='incremental')
+    args = parser.parse_args()
+
+    fen = None
+    for res in run(args.depth, configs=args.configs, evaluation=args.evaluation):
+        if res['fen'] != fen:
+            fen = res['fen']
+            print(fen)
+        print('  {config:<15} move: {move}, score: {score}, nodes: {nodes}, time: {time:0.3f}s, '
+              'researches: {researches}, aspiration fails: {aspfails}'.format(**res))
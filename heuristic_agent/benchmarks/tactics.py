@@ -0,0 +1,99 @@
+"""
+Tactical suite: positions solved by ABIterDeepEngine with each selective search technique at a fixed time per
+position, and nodes searched to a fixed depth, which unlike the nodes at fixed time measure what the pruning saves
+
+    python -m heuristic_agent.benchmarks.tactics --time 5 --depth 5
+"""
+import argparse
+import time
+from collections import OrderedDict
+
+from heuristic_agent.engines.alphabeta_cached_iterdeep import ABIterDeepEngine
+from heuristic_agent.env.board import ChessBoard
+
+# first positions of Win At Chess, https://www.chessprogramming.org/Win_at_Chess
+WAC = [
+    '2rr3k/pp3pp1/1nnqbN1p/3pN3/2pP4/2P3Q1/PPB4P/R4RK1 w - - bm Qg6; id "WAC.001";',
+    '8/7p/5k2/5p2/p1p2P2/Pr1pPK2/1P1R3P/8 b - - bm Rxb2; id "WAC.002";',
+    '5rk1/1ppb3p/p1pb4/6q1/3P1p1r/2P1R2P/PP1BQ1P1/5RKN w - - bm Rg3; id "WAC.003";',
+    'r1bq2rk/pp3pbp/2p1p1pQ/7P/3P4/2PB1N2/PP3PPR/2KR4 w - - bm Qxh7+; id "WAC.004";',
+    '5k2/6pp/p1qN4/1p1p4/3P4/2PKP2Q/PP3r2/3R4 b - - bm Qc4+; id "WAC.005";',
+    '7k/p7/1R5K/6r1/6p1/6P1/8/8 w - - bm Rb7; id "WAC.006";',
+    'rnbqkb1r/pppp1ppp/8/4P3/6n1/7P/PPPNPPP1/R1BQKBNR b KQkq - bm Ne3; id "WAC.007";',
+    'r4q1k/p2bR1rp/2p2Q1N/5p2/5p2/2P5/PP3PPP/R5K1 w - - bm Rf7; id "WAC.008";',
+    '3q1rk1/p4pp1/2pb3p/3p4/6Pr/1PNQ4/P1PB1PP1/4RRK1 b - - bm Bh2+; id "WAC.009";',
+    '2br2k1/2q3rn/p2NppQ1/2p1P3/Pp5R/4P3/1P3PPP/3R2K1 w - - bm Rxh7; id "WAC.010";',
+]
+
+CONFIGS = OrderedDict([
+    ('full-width', {}),
+    ('nullmove', {'nullmove': True}),
+    ('lmr', {'lmr': True}),
+    ('futility', {'futility': True}),
+    ('quiescence', {'quiescence': True}),
+    ('all', {'nullmove': True, 'lmr': True, 'futility': True, 'quiescence': True}),
+])
+
+
+def solve(epd: str, movetime: float, maxdepth=20, **kwargs):
+    board = ChessBoard()
+    ops = board.set_epd(epd)
+    engine = ABIterDeepEngine(maxdepth, soft_time=movetime / 2, hard_time=movetime, verbose=False, **kwargs)
+    start = time.perf_counter()
+    for move in engine.choose(board):
+        pass
+    return {'id': ops.get('id', board.fen()), 'move': board.san(move), 'solved': move in ops['bm'],
+            'depth': engine.stats['depth'], 'nodes': engine._searched, 'time': time.perf_counter() - start}
+
+
+def solve_depth(epd: str, depth: int, **kwargs):
+    board = ChessBoard()
+    ops = board.set_epd(epd)
+    engine = ABIterDeepEngine(depth, verbose=False, **kwargs)
+    start = time.perf_counter()
+    for move in engine.choose(board):
+        pass
+    return {'id': ops.get('id', board.fen()), 'move': board.san(move), 'solved': move in ops['bm'],
+            'depth': depth, 'nodes': engine._searched, 'time': time.perf_counter() - start}
+
+
+def run(movetime=5., configs=tuple(CONFIGS), suite=tuple(WAC), evaluation='incremental'):
+    results = OrderedDict()
+    for name in configs:
+        results[name] = [solve(epd, movetime, evaluation=evaluation, **CONFIGS[name]) for epd in suite]
+    return results
+
+
+def run_depth(depth=5, configs=tuple(CONFIGS), suite=tuple(WAC), evaluation='incremental'):
+    results = OrderedDict()
+    for name in configs:
+        results[name] = [solve_depth(epd, depth, evaluation=evaluation, **CONFIGS[name]) for epd in suite]
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--time', type=float, default=5., help='seconds per position, 0 to skip')
+    parser.add_argument('--depth', type=int, default=5, help='depth of the node counts, 0 to skip')
+    parser.add_argument('--configs', nargs='+', choices=CONFIGS, default=list(CONFIGS))
+    parser.add_argument('--evaluation', default='incremental')
+    parser.add_argument('-v', '--verbose', action='store_true', help='print the result of every position')
+    args = parser.parse_args()
+
+    sections = []
+    if args.time:
+        sections.append(('fixed time: {}s per position'.format(args.time),
+                         run(args.time, args.configs, evaluation=args.evaluation)))
+    if args.depth:
+        sections.append(('fixed depth: {}'.format(args.depth),
+                         run_depth(args.depth, args.configs, evaluation=args.evaluation)))
+    for title, section in sections:
+        print(title)
+        for name, results in section.items():
+            print('{:<12} solved: {}/{}, nodes: {}, mean depth: {:0.1f}, time: {:0.2f}s'.format(
+                name, sum(res['solved'] for res in results), len(results), sum(res['nodes'] for res in results),
+                sum(res['depth'] for res in results) / len(results), sum(res['time'] for res in results)))
+            if args.verbose:
+                for res in results:
+                    print('  {id:<8} {move:<7} {status:<6} depth: {depth}, nodes: {nodes}'.format(
+                        status='ok' if res['solved'] else 'fail', **res))
@@ -0,0 +1,87 @@
+"""
+Stress test of the SharedTranspositionTable: processes store and probe the same small table concurrently,
+every hit must return the entry stored for its key
+
+    python -m heuristic_agent.benchmarks.tt_stress --workers 4 --seconds 5
+"""
+import argparse
+import multiprocessing
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+
+from heuristic_agent.enhancements.transposition_table import SharedTranspositionTable, Flag, decode_move
+
+NB_KEYS = 1 << 14
+
+
+def _keys(seed=0):
+    rng = random.Random(seed)
+    return [rng.getrandbits(64) for _ in range(NB_KEYS)]
+
+
+def expected(key: int):
+    """The entry every process stores for the key: (move, depth, score)"""
+    move = decode_move(key & 0xfff)
+    return move, key >> 12 & 0x3f, (key >> 20 & 0xffff) - 0x8000
+
+
+def worker(table: SharedTranspositionTable, seed: int, seconds: float, results):
+    keys = _keys()
+    known = set(keys)
+    rng = random.Random(seed)
+    stores = probes = hits = corrupted = torn = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(1000):
+            key = rng.choice(keys)
+            board = SimpleNamespace(hashkey=key)
+            if rng.random() < 0.5:
+                move, depth, score = expected(key)
+                table.put(board, move, depth, 0, score)
+                stores += 1
+            else:
+                probes += 1
+                entry = table.retrieve(board)
+                if entry is not None:
+                    hits += 1
+                    if (entry.move, entry.depth, entry.score) != expected(key) or entry.flag is not Flag.EXACT:
+                        corrupted += 1
+        # entries whose two words do not belong together, which retrieve must have ignored
+        data = table._table
+        for i in range(0, len(data), 2):
+            if data[i + 1] and data[i] ^ data[i + 1] not in known:
+                torn += 1
+    results.put((stores, probes, hits, corrupted, torn))
+
+
+def run(workers=4, seconds=5., size_mb=0.0625):
+    table = SharedTranspositionTable(size_mb)
+    results = multiprocessing.Queue()
+    try:
+        procs = [multiprocessing.Process(target=worker, args=(table, seed, seconds, results))
+                 for seed in range(workers)]
+        for p in procs:
+            p.start()
+        totals = [sum(col) for col in zip(*(results.get() for _ in procs))]
+        for p in procs:
+            p.join()
+    finally:
+        table.unlink()
+    return dict(zip(('stores', 'probes', 'hits', 'corrupted', 'torn'), totals))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5.)
+    parser.add_argument('--size-mb', type=float, default=0.0625, help='kept small to force collisions')
+    args = parser.parse_args()
+
+    res = run(args.workers, args.seconds, args.size_mb)
+    print('stores: {stores}, probes: {probes}, hits: {hits}, corrupted hits: {corrupted}, '
+          'torn entries seen: {torn}'.format(**res))
+    if res['corrupted']:
+        sys.exit(1)
@@ -1,52 +1,65 @@
+import chess
+
 from heuristic_agent.env.board import ChessBoard
 from heuristic_agent.env.eval import INF
 from heuristic_agent.engines.negamax import NegamaxEngine
 from heuristic_agent.enhancements.moveordering import MoveOrdering
+from heuristic_agent.enhancements.see import see, PIECE_VALUES
 
 
 class AlphaBetaEngine(NegamaxEngine):
     FORMAT_STAT = (
 
             'score: {score} [time: {time:0.3f}s, pv: {pv}]\n' +
-            'nps: {nps}, nodes: {nodes}, betacuts: {betacuts}\n' +
+            'nps: {nps}, nodes: {nodes}, qnodes: {qnodes}, betacuts: {betacuts}\n' +
             'leaves: {leaves}, draws: {draws}, mates: {mates}'
     )
-
-    def __init__(self, maxdepth=2, ordering='seq'):
-        super().__init__(maxdepth)
+    # captures that cannot bring the score within this margin of alpha are not searched by quiesce
+    DELTA_MARGIN = 200
+
+    def __init__(self, maxdepth=2, ordering='seq', quiescence=False, **kwargs):
+        """
+        :param quiescence: resolve the captures at the leaves with quiesce instead of evaluating them statically
+        """
+        super().__init__(maxdepth, **kwargs)
         self.moveorder = MoveOrdering(ordering)
         self.order = self.moveorder.order
+        self._quiescence = quiescence
 
     def initcounter(self):
         super(AlphaBetaEngine, self).initcounter()
         self._counters['betacuts'] = 0
+        self._counters['qnodes'] = 0
 
-    def search(self, board: ChessBoard, depth, ply=0, alpha=-INF, beta=INF):
-        self.inc('nodes')
+    def search(self, board: ChessBoard, depth, ply=0, alpha=-INF, beta=INF) -> int:
+        self._nodes += 1
+        self._pv.clear(ply)
 
-        if board.end is not None:
+        end = board.end
+        if end is not None:
             self.inc('leaves')
-            if board.end == 0:
+            if end == 0:
                 self.inc('draws')
             else:
                 self.inc('mates')
-            return [], self.evaluate(board)
+            return self.evaluate(board)
 
         if depth <= 0:
             self.inc('leaves')
-            # return [], self.quiesce(board, alpha, beta)
-            return [], self.evaluate(board)
+            if self._quiescence:
+                return self.quiesce(board, alpha, beta)
+            return self.evaluate(board)
 
-        bestmove = []
+        bestmove = None
         bestscore = -INF - 1
         for m in self.order(board):
             board.push(m)
-            nextmoves, score = self.search(board, depth - 1, ply + 1, -beta, -alpha)
+            score = -self.search(board, depth - 1, ply + 1, -beta, -alpha)
             board.pop()
-            score = -score
-            if not bestmove or score > bestscore:
+            if bestmove is None or score > bestscore:
                 bestscore = score
-                bestmove = [m] + nextmoves
+                bestmove = m
+                self._pv.update(ply, m)
             if score > alpha:
                 alpha = score
 
@@ -54,17 +67,42 @@ class AlphaBetaEngine(NegamaxEngine):
                 self.inc('betacuts')
                 break
 
-        return bestmove, alpha
+        return alpha
 
     def quiesce(self, board, alpha: int, beta: int) -> int:
-        # https://www.chessprogramming.org/Quiescence_Search
+        """
+        Search the captures until the position is quiet, so that leaves are not evaluated in the middle of
+        an exchange. Captures losing material (SEE < 0) and captures that cannot raise the score to alpha
+        (delta pruning) are skipped; in check, every evasion is searched instead of standing pat
+        https://www.chessprogramming.org/Quiescence_Search
+        """
+        self.inc('qnodes')
+        if board.is_check():
+            moves = board.moves
+            if not moves:
+                return self.evaluate(board)
+            for move in moves:
+                board.push(move)
+                score = -self.quiesce(board, -beta, -alpha)
+                board.pop()
+                if score >= beta:
+                    return beta
+                if score > alpha:
+                    alpha = score
+            return alpha
+
         stand_pat = self.evaluate(board)
         if stand_pat >= beta:
             return beta
         if alpha < stand_pat:
             alpha = stand_pat
-        captures = self.moveorder.sort_mvv_lva(board, [m for m in board.moves if board.is_capture(m)])
-        for move in captures:
+        for move in self.moveorder.captures(board):
+            captured = board.piece_type_at(move.to_square) or chess.PAWN
+            gain = PIECE_VALUES[captured]
+            if move.promotion:
+                gain += PIECE_VALUES[move.promotion] - PIECE_VALUES[chess.PAWN]
+            if stand_pat + gain + self.DELTA_MARGIN <= alpha or see(board, move) < 0:
+                continue
             board.push(move)
             score = -self.quiesce(board, -beta, -alpha)
             board.pop()
@@ -1,90 +1,223 @@
-from typing import Tuple, List
 import chess
 
+from heuristic_agent.enhancements.history import HistoryTable, CounterMoves
 from heuristic_agent.enhancements.killer_moves import KillerMoves
 from heuristic_agent.env.board import ChessBoard
 from heuristic_agent.engines.alphabeta import AlphaBetaEngine
 from heuristic_agent.env.eval import INF
-from heuristic_agent.enhancements.transposition_table import TranspositionTable, Flag, Entry
+from heuristic_agent.enhancements.transposition_table import TranspositionTable, BucketTranspositionTable, Flag, \
+    Entry
 
 
 class ABCachedEngine(AlphaBetaEngine):
     FORMAT_STAT = (
             'score: {score} [time: {time:0.3f}s, pv: {pv}]\n' +
-            'nps: {nps}, nodes: {nodes}, betacuts: {betacuts}\n' +
+            'nps: {nps}, nodes: {nodes}, qnodes: {qnodes}, betacuts: {betacuts}\n' +
             'hits: {hits}, leaves: {leaves}, draws: {draws}, mates: {mates}'
     )
 
-    def __init__(self, maxdepth=2, ordering='cache', maxitems=1024000, nb_killers=2):
-        super(ABCachedEngine, self).__init__(maxdepth, ordering)
-        self._cache = TranspositionTable(maxitems)
+    # depth reduction of the null move search
+    NULLMOVE_R = 2
+    # number of moves searched at full depth before late move reductions apply
+    LMR_MOVES = 3
+    # quiet moves are not searched at depth 1 when the static evaluation is this far below alpha
+    FUTILITY_MARGIN = 200
+
+    def __init__(self, maxdepth=2, ordering='cache', maxitems=1024000, nb_killers=2, hash_mb=0, tt=None, pvs=False,
+                 nullmove=False, lmr=False, futility=False, **kwargs):
+        """
+        :param maxitems: number of entries of the dict-based transposition table
+        :param hash_mb: if set, use a BucketTranspositionTable of this many megabytes instead
+        :param tt: transposition table to use instead of a new one, e.g. a SharedTranspositionTable
+            attached by engines of other processes
+        :param pvs: principal variation search, the moves after the first one are searched with a null window
+            and only searched again with the full window when they fail high
+        :param nullmove: null move pruning, a node is cut when passing the turn still fails high on a search
+            reduced by NULLMOVE_R plies; disabled in check and when the side to move only has pawns left (zugzwang)
+        :param lmr: late move reductions, quiet moves ordered after the first LMR_MOVES ones are searched one ply
+            shallower with a null window, and searched again at full depth if they beat alpha
+        :param futility: futility pruning, at depth 1 quiet moves are skipped when the static evaluation plus
+            FUTILITY_MARGIN does not reach alpha
+        """
+        super(ABCachedEngine, self).__init__(maxdepth, ordering, **kwargs)
+        if tt is not None:
+            self._cache = tt
+        elif hash_mb:
+            self._cache = BucketTranspositionTable(hash_mb)
+        else:
+            self._cache = TranspositionTable(maxitems)
+        # node count at which the search calls check_limits
+        self._checkpoint = float('inf')
+        self._rootbest = None
+        self._pvs = pvs
+        self._nullmove = nullmove
+        self._lmr = lmr
+        self._futility = futility
         self._killers = KillerMoves(maxdepth, nb_killers)
+        self._history = HistoryTable()
+        self._countermoves = CounterMoves()
         self.moveorder.set_tt(self._cache)
         self.moveorder.set_km(self._killers)
+        self.moveorder.set_history(self._history, self._countermoves)
 
     def initcounter(self):
         super(ABCachedEngine, self).initcounter()
         self._counters['hits'] = 0
 
-    def search(self, board: ChessBoard, depth, ply=0, alpha=-INF, beta=INF) -> Tuple[List[chess.Move], int]:
-        orig_alpha = alpha
+    def choose(self, board):
+        self._cache.new_search()
+        self._history.age()
+        self.moveorder.set_pv(board, [])
+        return super(ABCachedEngine, self).choose(board)
+
+    def check_limits(self):
+        """
+        Called when the node count reaches _checkpoint, raise SearchAborted to stop the search
+        """
+        self._checkpoint = float('inf')
+
+    @property
+    def stats(self):
+        stats = super(ABCachedEngine, self).stats
+        stats['hashfull'] = self._cache.hashfull()
+        # share of the beta cutoffs produced by the first move searched
+        stats['firstcutrate'] = stats['firstcuts'] / stats['betacuts'] if stats['betacuts'] else 0.
+        return stats
+
+    def search(self, board: ChessBoard, depth, ply=0, alpha=-INF, beta=INF) -> int:
+        orig_alpha, orig_beta = alpha, beta
+        self._pv.clear(ply)
         ttEntry: Entry = self._cache.retrieve(board)
         if ttEntry and ttEntry.depth >= depth:
             self.inc('hits')
             if ttEntry.flag is Flag.EXACT:
-                return [ttEntry.move], ttEntry.score
+                self.inc('ttcuts')
+                if ttEntry.move:
+                    self._pv.set(ply, ttEntry.move)
+                return ttEntry.score
             elif ttEntry.flag is Flag.LOWERBOUND and ttEntry.score > alpha:
                 alpha = ttEntry.score
             elif ttEntry.flag is Flag.UPPERBOUND and ttEntry.score < beta:
                 beta = ttEntry.score
 
             if alpha >= beta:
+                self.inc('ttcuts')
                 if not board.is_capture(ttEntry.move):
                     self._killers.insert_killer(ttEntry.move, ply)
-                return [ttEntry.move], ttEntry.score
+                if ttEntry.move:
+                    self._pv.set(ply, ttEntry.move)
+                return ttEntry.score
 
-        self.inc('nodes')
+        self._nodes += 1
+        if self._nodes >= self._checkpoint:
+            self.check_limits()
 
-        if board.end is not None:
+        end = board.end
+        if end is not None:
             self.inc('leaves')
-            if board.end == 0:
+            if end == 0:
                 self.inc('draws')
             else:
                 self.inc('mates')
             board_score = self.evaluate(board)
-            self._cache.put(board, chess.Move.null(), depth, ply, board_score, alpha, beta)
-            return [], board_score
+            self._cache.put(board, chess.Move.null(), depth, ply, board_score, orig_alpha, orig_beta)
+            return board_score
 
         elif depth == 0:
             self.inc('leaves')
+            if self._quiescence:
+                # not stored: the transposition table takes the scores of depth 0 as exact
+                return self.quiesce(board, alpha, beta)
             board_score = self.evaluate(board)
-            self._cache.put(board, chess.Move.null(), depth, ply, board_score, alpha, beta)
-            # return [], self.quiesce(board, alpha, beta)
-            return [], board_score
+            self._cache.put(board, chess.Move.null(), depth, ply, board_score, orig_alpha, orig_beta)
+            return board_score
 
         else:
-            bestmove = []
+            in_check = board.is_check()
+            if self._nullmove and ply and depth > self.NULLMOVE_R and not in_check and beta < INF \
+                    and board.move_stack[-1] and board.occupied_co[board.turn] & ~(board.pawns | board.kings):
+                # https://www.chessprogramming.org/Null_Move_Pruning
+                board.push(chess.Move.null())
+                score = -self.search(board, depth - 1 - self.NULLMOVE_R, ply + 1, -beta, -beta + 1)
+                board.pop()
+                if score >= beta:
+                    self.inc('nullcuts')
+                    return beta
+
+            # https://www.chessprogramming.org/Futility_Pruning
+            futility_score = None
+            if self._futility and depth == 1 and not in_check:
+                futility_score = self.evaluate(board) + self.FUTILITY_MARGIN
+                if futility_score > alpha:
+                    futility_score = None
+
+            bestmove = None
             bestscore = -INF - 1
             # examine all other possible moves
-            for m in self.order(board, ply):
+            for i, m in enumerate(self.order(board, ply)):
+                quiet = not m.promotion and not board.is_capture(m)
                 board.push(m)
-                nextmoves, score = self.search(board, depth - 1, ply + 1, -beta, -alpha)
+                reduced = False
+                if quiet and bestmove is not None and not board.is_check():
+                    if futility_score is not None:
+                        board.pop()
+                        self.inc('futile')
+                        bestscore = max(bestscore, futility_score)
+                        continue
+                    if self._lmr and i >= self.LMR_MOVES and depth >= 3 and not in_check \
+                            and not self._killers.is_killer(m, ply):
+                        # https://www.chessprogramming.org/Late_Move_Reductions
+                        self.inc('reductions')
+                        score = -self.search(board, depth - 2, ply + 1, -alpha - 1, -alpha)
+                        reduced = score <= alpha
+                # a move failing low on the reduced search is not searched again
+                if not reduced:
+                    if self._pvs and bestmove is not None and beta - alpha > 1:
+                        # https://www.chessprogramming.org/Principal_Variation_Search
+                        score = -self.search(board, depth - 1, ply + 1, -alpha - 1, -alpha)
+                        if alpha < score < beta:
+                            self.inc('researches')
+                            score = -self.search(board, depth - 1, ply + 1, -beta, -alpha)
+                    else:
+                        score = -self.search(board, depth - 1, ply + 1, -beta, -alpha)
                 board.pop()
-                score = -score
-                if not bestmove or score > bestscore:
+                if bestmove is None or score > bestscore:
                     bestscore = score
-                    bestmove = [m] + nextmoves
+                    bestmove = m
+                    self._pv.update(ply, m)
+                    if ply == 0 and score > alpha:
+                        # kept in case the search is aborted before the other root moves are searched, only when
+                        # its score is exact or a lower bound: a move failing low only proves an upper bound
+                        self._rootbest = self._pv.pv(), bestscore, bestscore >= beta
                 if bestscore > alpha:
                     alpha = bestscore
 
                 if bestscore >= beta:
                     self.inc('betacuts')
+                    if i == 0:
+                        self.inc('firstcuts')
                     if alpha >= beta:
                         if not board.is_capture(m):
                             self._killers.insert_killer(m, ply)
+                            self._history.update(board.turn, m, depth)
+                            if board.move_stack:
+                                self._countermoves.update(board.move_stack[-1], m)
                     break
-            self._cache.put(board, bestmove[0], depth, ply, bestscore, alpha, beta)
-            return bestmove, bestscore
+            self._cache.put(board, bestmove, depth, ply, bestscore, orig_alpha, orig_beta)
+            return bestscore
+
+    def quiesce(self, board: ChessBoard, alpha: int, beta: int) -> int:
+        """
+        AlphaBetaEngine.quiesce, returning early on the bounds stored by the search in the transposition table
+        """
+        ttEntry: Entry = self._cache.retrieve(board)
+        if ttEntry:
+            if ttEntry.flag is Flag.EXACT or \
+                    ttEntry.flag is Flag.LOWERBOUND and ttEntry.score >= beta or \
+                    ttEntry.flag is Flag.UPPERBOUND and ttEntry.score <= alpha:
+                self.inc('qhits')
+                return min(max(ttEntry.score, alpha), beta)
+        return super(ABCachedEngine, self).quiesce(board, alpha, beta)
 
     def __str__(self):
         return 'AlphaBetaCache(depth=%s)' % self._maxdepth
@@ -1,24 +1,238 @@
+import multiprocessing
+import signal
+import time
+from typing import List, Tuple
+
+import chess
+
 from heuristic_agent.env.board import ChessBoard
 from heuristic_agent.engines.alphabeta_cached import ABCachedEngine
+from heuristic_agent.engines.base import SearchAborted
+from heuristic_agent.env.eval import INF
+from heuristic_agent.enhancements.transposition_table import SharedTranspositionTable
+
+
+class HelperError(RuntimeError):
+    """Raised when a helper process of the Lazy SMP search exits with an error"""
 
 
 class ABIterDeepEngine(ABCachedEngine):
     FORMAT_STAT = (
             '[depth: {depth}] score: {score} [time: {time:0.3f}s, pv: {pv}]\n' +
-            'nps: {nps}, nodes: {nodes}, betacuts: {betacuts}\n' +
+            'nps: {nps}, nodes: {nodes}, qnodes: {qnodes}, betacuts: {betacuts}\n' +
             'hits: {hits}, leaves: {leaves}, draws: {draws}, mates: {mates}'
     )
 
-    def __init__(self, maxdepth=4, ordering='cache', maxitems=1024000):
-        super(ABIterDeepEngine, self).__init__(maxdepth, ordering, maxitems)
+    def __init__(self, maxdepth=4, ordering='cache', maxitems=1024000, workers=1, soft_time=None, hard_time=None,
+                 max_nodes=None, check_every=1024, aspiration=0, mp_context=None, **kwargs):
+        """
+        :param workers: number of processes searching the position (Lazy SMP): the main search and workers - 1
+            helpers, sharing a SharedTranspositionTable of hash_mb megabytes (64 by default) unless tt is given
+        :param soft_time: seconds after which no new iteration is started, nor one that the branching factor
+            of the previous iterations predicts to end after this time
+        :param hard_time: seconds after which the search is aborted, within check_every nodes
+        :param max_nodes: number of nodes after which the search is aborted, for reproducible searches
+        :param check_every: number of nodes between two checks of the time limit
+        :param aspiration: half-width of the aspiration window around the score of the previous iteration,
+            multiplied by 4 every time the search fails outside of it; 0 searches with a full window
+        :param mp_context: multiprocessing context starting the helpers, e.g. multiprocessing.get_context('spawn'),
+            the default context if None
+        """
+        if workers > 1 and kwargs.get('tt') is None:
+            kwargs['tt'] = SharedTranspositionTable(kwargs.get('hash_mb') or 64)
+        super(ABIterDeepEngine, self).__init__(maxdepth, ordering, maxitems, **kwargs)
+        self._workers = workers
+        self._soft_time = soft_time
+        self._hard_time = hard_time
+        self._max_nodes = max_nodes
+        self._check_every = check_every
+        self._aspiration = aspiration
+        self._mp = mp_context if mp_context is not None else multiprocessing
+        self._deadline = None
+        self._searched = 0
+        self._helper_args = (maxdepth, ordering, maxitems, kwargs)
+        self._workernodes = None
 
     def choose(self, board: ChessBoard):
-        for depth in range(1, self._maxdepth + 1):
-            self.initcounter()
-            self._counters['depth'] = depth
-            pv, score = self.search(board, depth)
-            self.showstats(pv, score)
-            yield pv[0]
+        """
+        Search the position deeper and deeper, yielding the best move of every iteration.
+        When the search is aborted by hard_time or max_nodes, the best move of the aborted iteration is yielded
+        if its score is exact, or a lower bound above the score of the last iteration, and stats['aborted'] is set.
+        A search aborted during the first iteration still yields a legal move, with a None score if none was proven
+        Raises HelperError if a helper of the Lazy SMP search fails
+        """
+        self._cache.new_search()
+        self._history.age()
+        self.moveorder.set_pv(board, [])
+        start = time.time()
+        self._deadline = start + self._hard_time if self._hard_time is not None else None
+        self._searched = 0
+        helpers = self._start_helpers(board)
+        ply = len(board.move_stack)
+        iteration_nodes = []
+        score = None
+        try:
+            for depth in range(1, self._maxdepth + 1):
+                if depth > 1 and not self._next_iteration(time.time() - start, iteration_nodes):
+                    break
+                self.initcounter()
+                self._counters['depth'] = depth
+                self._rootbest = None
+                self._checkpoint = self._next_checkpoint()
+                iteration_start = time.time()
+                try:
+                    pv, score = self._search_iteration(board, depth, score)
+                except SearchAborted:
+                    while len(board.move_stack) > ply:
+                        board.pop()
+                    self._counters['aborted'] = 1
+                    self._searched += self._nodes
+                    if self._rootbest is not None:
+                        pv, rootscore, lowerbound = self._rootbest
+                        # a lower bound not above the score of the last iteration does not prove the move better
+                        if not lowerbound or score is None or rootscore > score:
+                            self.showstats(pv, rootscore)
+                            yield pv[0]
+                            break
+                    if depth == 1:
+                        # nothing was yielded yet: the first move in search order rather than none, without a score
+                        move = next(iter(self.order(board, 0)), None)
+                        if move is not None:
+                            self.showstats([move], None)
+                            yield move
+                    break
+                finally:
+                    self._checkpoint = float('inf')
+                self._searched += self._nodes
+                # the moves of the principal variation are searched first at the next iteration
+                self.moveorder.set_pv(board, pv)
+                iteration_nodes.append((self._nodes, time.time() - iteration_start))
+                if len(iteration_nodes) > 1 and iteration_nodes[-2][0]:
+                    self._counters['ebf'] = iteration_nodes[-1][0] / iteration_nodes[-2][0]
+                if helpers:
+                    self._workernodes[0] = self._searched
+                    self._check_helpers(helpers)
+                self.showstats(pv, score)
+                yield pv[0]
+        finally:
+            self._stop_profile()
+            for helper in helpers:
+                if helper.exitcode is None:
+                    helper.terminate()
+                helper.join()
+        self._check_helpers(helpers)
+
+    def _search_iteration(self, board: ChessBoard, depth: int, score) -> Tuple[List[chess.Move], int]:
+        """
+        Search of one iteration
+        :param score: score of the previous iteration, None for the first one
+        :return: principal variation and score
+        """
+        score = self._aspiration_search(board, depth, score)
+        return self._pv.pv(), score
+
+    def _aspiration_search(self, board: ChessBoard, depth: int, score):
+        # https://www.chessprogramming.org/Aspiration_Windows
+        if not self._aspiration or score is None:
+            return self.search(board, depth)
+        delta = self._aspiration
+        alpha, beta = score - delta, score + delta
+        while True:
+            score = self.search(board, depth, 0, alpha, beta)
+            if score <= alpha and alpha > -INF:
+                delta *= 4
+                alpha = max(score - delta, -INF)
+                # the moves of the failed search are only upper bounds
+                self._rootbest = None
+            elif score >= beta and beta < INF:
+                delta *= 4
+                beta = min(score + delta, INF)
+            else:
+                return score
+            self.inc('aspfails')
+
+    def set_limits(self, soft_time=None, hard_time=None, max_nodes=None):
+        """
+        Replace the limits of the next searches, see __init__ for soft_time, hard_time and max_nodes
+        """
+        self._soft_time = soft_time
+        self._hard_time = hard_time
+        self._max_nodes = max_nodes
+
+    def _next_iteration(self, elapsed, iteration_nodes) -> bool:
+        if self._max_nodes is not None and self._searched >= self._max_nodes:
+            return False
+        if self._soft_time is None:
+            return True
+        if elapsed >= self._soft_time:
+            return False
+        nodes, iteration_time = iteration_nodes[-1]
+        if len(iteration_nodes) > 1 and iteration_nodes[-2][0]:
+            # effective branching factor of the last iteration
+            iteration_time *= nodes / iteration_nodes[-2][0]
+        return elapsed + iteration_time < self._soft_time
+
+    def _next_checkpoint(self):
+        checkpoint = float('inf')
+        if self._deadline is not None:
+            checkpoint = self._nodes + self._check_every
+        if self._max_nodes is not None:
+            checkpoint = min(checkpoint, self._max_nodes - self._searched)
+        return checkpoint
+
+    def check_limits(self):
+        if self._max_nodes is not None and self._searched + self._nodes >= self._max_nodes:
+            raise SearchAborted()
+        if self._deadline is not None and time.time() >= self._deadline:
+            raise SearchAborted()
+        self._checkpoint = self._next_checkpoint()
+
+    def _start_helpers(self, board: ChessBoard):
+        if self._workers <= 1:
+            return []
+        self._workernodes = self._mp.RawArray('q', self._workers)
+        # the helpers replay the moves from the root position rather than receive the board itself
+        fen, moves = board.root().fen(), list(board.move_stack)
+        helpers = [self._mp.Process(target=_lazy_smp_helper, daemon=True,
+                                    args=(type(self), self._helper_args, fen, moves, index, self._workernodes))
+                   for index in range(1, self._workers)]
+        for helper in helpers:
+            helper.start()
+        return helpers
+
+    @staticmethod
+    def _check_helpers(helpers):
+        # helpers exit with -SIGTERM when terminated at the end of the search
+        failed = ['%d: %s' % (index, helper.exitcode) for index, helper in enumerate(helpers, 1)
+                  if helper.exitcode not in (None, 0, -signal.SIGTERM)]
+        if failed:
+            raise HelperError('Lazy SMP helpers exited with an error (index: exit code): %s' % ', '.join(failed))
+
+    @property
+    def stats(self):
+        stats = super(ABIterDeepEngine, self).stats
+        if self._workernodes is not None:
+            stats['workernodes'] = list(self._workernodes)
+        return stats
 
     def __str__(self):
         return 'ABIterativeDeepening(max_depth=%s)' % self._maxdepth
+
+
+def _lazy_smp_helper(engine_cls, args, fen: str, moves: List[chess.Move], index: int, workernodes):
+    """
+    Iterative deepening of a helper of the Lazy SMP search, which only feeds the shared transposition table.
+    Half of the helpers start one depth ahead so that the workers do not search the same tree in lockstep;
+    workernodes[index] is updated at the end of every iteration
+    """
+    maxdepth, ordering, maxitems, kwargs = args
+    board = ChessBoard(fen)
+    for move in moves:
+        board.push(move)
+    engine = engine_cls(maxdepth, ordering, maxitems, **kwargs)
+    searched = 0
+    for depth in range(1 + index % 2, maxdepth + 1):
+        engine.initcounter()
+        engine.search(board, depth)
+        searched += engine._nodes
+        workernodes[index] = searched
@@ -1,31 +1,82 @@
 import time
 from collections import defaultdict
-from typing import List
+from typing import Dict, List, Sequence
 
 import chess
 
+from heuristic_agent.engines.profiler import SearchProfiler
+from heuristic_agent.engines.telemetry import TelemetrySink
+
+
+def _ignore(cnt):
+    pass
+
+
+class SearchAborted(Exception):
+    """Raised from within a search when its time or node limit is reached"""
+
 
 class Engine(object):
     FORMAT_STAT = ""
+    # print the statistics of every search, they are kept in stats either way
+    verbose = False
+    # sinks receiving the telemetry_record of every search
+    telemetry: Sequence[TelemetrySink] = ()
+    # count the leaves, draws, mates, cutoffs... of the searches; the nodes are counted either way
+    counters = True
+    _profile = False
+    _profiler = None
+    # counters and nodes of the last search, empty until the first one (initcounter replaces them)
+    _counters = defaultdict(int)
+    _nodes = 0
+
+    @property
+    def profile(self) -> bool:
+        """Sample the time spent in every phase of the searches, broken down in stats['profile']"""
+        return self._profile
+
+    @profile.setter
+    def profile(self, profile: bool):
+        self._profile = profile
+        if not profile and self._profiler is not None:
+            # the breakdown of the last profiled search is dropped along with the profiler
+            self._profiler.stop()
+            self._profiler = None
 
     def choose(self, board):
         raise NotImplemented
 
     def initcounter(self):
         self._startt = time.time()
+        # kept out of the counters as it is incremented at every node, and stored in them by stats
+        self._nodes = 0
         self._counters = cnt = defaultdict(int)
         cnt['nodes'] = 0
         cnt['leaves'] = 0
         cnt['draws'] = 0
         cnt['mates'] = 0
+        if self.counters:
+            self.__dict__.pop('inc', None)
+        else:
+            self.inc = _ignore
+        if self.profile:
+            if self._profiler is None:
+                self._profiler = SearchProfiler()
+            self._profiler.start()
 
     def inc(self, cnt):
         self._counters[cnt] += 1
 
+    def _stop_profile(self):
+        if self._profiler is not None:
+            self._profiler.stop()
+
     def showstats(self, pv: List[chess.Move], score: int):
+        self._stop_profile()
         t = time.time() - self._startt
+        self._counters['nodes'] = self._nodes
         if t:
-            nps = self._counters['nodes'] / t
+            nps = self._nodes / t
         else:
             nps = 0
 
@@ -36,9 +87,59 @@ class Engine(object):
         ctx['nps'] = nps
         ctx['score'] = score
         ctx['time'] = t
-        print(self.__str__())
-        print(self.FORMAT_STAT.format(**ctx))
+        if self.telemetry:
+            record = self.telemetry_record(ctx)
+            for sink in self.telemetry:
+                sink.emit(record)
+        if self.verbose:
+            print(self.__str__())
+            print(self.FORMAT_STAT.format(**ctx))
+            if self._profiler is not None:
+                print('profile: ' + ', '.join('{} {:0.1%}'.format(phase, res['share'])
+                                              for phase, res in self._profiler.breakdown().items()))
+
+    def telemetry_record(self, ctx) -> Dict:
+        """
+        Record of the search sent to the telemetry sinks
+        :param ctx: counters of the search, completed by showstats
+        :return: flat dict, the effective branching factor is ctx['ebf'] if set, nodes ** (1 / depth) otherwise;
+            the fields computed from the counters of inc are None when counters is False
+        """
+        nodes = ctx['nodes']
+        depth = ctx.get('depth') or getattr(self, '_maxdepth', None)
+        probes = nodes + ctx.get('ttcuts', 0)
+        betacuts = ctx.get('betacuts', 0)
+        ebf = ctx.get('ebf')
+        if ebf is None and depth and nodes:
+            ebf = nodes ** (1. / depth)
+        record = {
+            'engine': str(self),
+            'depth': depth,
+            'score': ctx['score'],
+            'pv': ctx['pv'].split(', ') if ctx['pv'] else [],
+            'nodes': nodes,
+            'qnodes': ctx.get('qnodes', 0),
+            'nps': ctx['nps'],
+            'tthitrate': ctx.get('hits', 0) / probes if probes else 0.,
+            'betacuts': betacuts,
+            'firstcutrate': ctx.get('firstcuts', 0) / betacuts if betacuts else 0.,
+            'ebf': ebf,
+            'time': ctx['time'],
+        }
+        if not self.counters:
+            # inc was disabled: these counters were not measured rather than zero
+            for field in ('qnodes', 'tthitrate', 'betacuts', 'firstcutrate'):
+                record[field] = None
+        if ctx.get('aborted'):
+            record['aborted'] = True
+        if self._profiler is not None:
+            record['profile'] = {phase: res['share'] for phase, res in self._profiler.breakdown().items()}
+        return record
 
     @property
     def stats(self):
-        return self._counters.copy()
\ No newline at end of file
+        stats = self._counters.copy()
+        stats['nodes'] = self._nodes
+        if self._profiler is not None:
+            stats['profile'] = self._profiler.breakdown()
+        return stats
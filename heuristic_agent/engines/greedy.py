@@ -2,7 +2,8 @@ import chess
 
 from heuristic_agent.env.board import ChessBoard
 from heuristic_agent.engines.base import Engine
-from heuristic_agent.env.eval import INF, evaluate
+from heuristic_agent.enhancements.eval_cache import EvalCache
+from heuristic_agent.env.eval import INF, get_evaluator, with_pawn_structure, evaluate_pawns_white
 
 
 class GreedyEngine(Engine):
@@ -11,23 +12,71 @@ class GreedyEngine(Engine):
     As the implementation of the evaluate function takes into account the player turn therefore
     the greedy Minimax engine can be implemented in a negamax way
     """
-    def __init__(self):
-        self.evaluate = evaluate
+    FORMAT_STAT = 'Best score: {score}\nBest move: {pv}'
+
+    def __init__(self, evaluation='classic', evalcache_mb=0, pawn_structure=False, pawnhash_mb=1, verbose=False,
+                 counters=True, profile=False, telemetry=None):
+        """
+        :param evaluation: name of the evaluation backend, see heuristic_agent.env.eval.EVALUATORS
+        :param evalcache_mb: memory budget of the evaluation cache in megabytes, 0 to disable it
+        :param pawn_structure: add doubled, isolated and passed pawn terms to the evaluation
+        :param pawnhash_mb: memory budget of the pawn hash table memoizing the pawn structure terms
+        :param verbose: print the statistics of every search to stdout
+        :param counters: count the leaves, draws, mates, cutoffs... of the searches, False only counts the nodes
+        :param profile: sample where the time of the searches goes (SearchProfiler), in stats['profile'];
+            the searches must run in the main thread
+        :param telemetry: TelemetrySink, or list of sinks, receiving a record of every search (of every iteration
+            for the iterative deepening engines)
+        """
+        self.verbose = verbose
+        if telemetry is not None:
+            self.telemetry = list(telemetry) if isinstance(telemetry, (list, tuple)) else [telemetry]
+        self.counters = counters
+        self.profile = profile
+        self._pawncache = None
+        if pawn_structure:
+            self._pawncache = EvalCache(evaluate_pawns_white, pawnhash_mb, key='pawnkey')
+            self.evaluate = with_pawn_structure(get_evaluator(evaluation, white=True), self._pawncache)
+        else:
+            self.evaluate = get_evaluator(evaluation)
+        self._evalcache = None
+        if evalcache_mb:
+            self._evalcache = self.evaluate = EvalCache(self.evaluate, evalcache_mb)
+
+    def initcounter(self):
+        super(GreedyEngine, self).initcounter()
+        if self._evalcache is not None:
+            self._evalcache.reset_stats()
+        if self._pawncache is not None:
+            self._pawncache.reset_stats()
+
+    @property
+    def stats(self):
+        stats = super(GreedyEngine, self).stats
+        if self._evalcache is not None:
+            stats['evalhits'] = self._evalcache.hits
+            stats['evalmisses'] = self._evalcache.misses
+        if self._pawncache is not None:
+            stats['pawnhits'] = self._pawncache.hits
+            stats['pawnmisses'] = self._pawncache.misses
+            stats['pawnhitrate'] = self._pawncache.hitrate
+        return stats
 
     def choose(self, board: ChessBoard):
+        self.initcounter()
         bestmove = chess.Move.null()
         bestscore = -INF
 
         for m in board.moves:
             board.push(m)
+            self._nodes += 1
             score = -self.evaluate(board)
             board.pop()
             if score > bestscore:
                 bestmove = m
                 bestscore = score
 
-        print('Best score: ', bestscore)
-        print('Best move: ', bestmove)
+        self.showstats([bestmove] if bestmove else [], bestscore)
 
         return bestmove, bestscore
 
@@ -1,6 +1,7 @@
 from heuristic_agent.engines.base import Engine
-from heuristic_agent.env.eval import evaluate_white, INF
+from heuristic_agent.env.eval import get_evaluator, INF
 from heuristic_agent.env.board import ChessBoard
+from heuristic_agent.enhancements.pv_table import PVTable
 
 
 class MinimaxEngine(Engine):
@@ -9,59 +10,66 @@ class MinimaxEngine(Engine):
             'nps: {nps}, nodes: {nodes}, leaves: {leaves}, draws: {draws}, mates: {mates}'
     )
 
-    def __init__(self, max_depth):
+    def __init__(self, max_depth, evaluation='classic'):
         self._maxdepth = max_depth
-        self.evaluate = evaluate_white
-
-    def min_level(self, board: ChessBoard, depth: int):
-        self.inc('nodes')
-        if board.end is not None:
+        self.evaluate = get_evaluator(evaluation, white=True)
+        self._pv = PVTable(max_depth)
+
+    def min_level(self, board: ChessBoard, depth: int, ply=0):
+        self._nodes += 1
+        self._pv.clear(ply)
+        end = board.end
+        if end is not None:
             self.inc('leaves')
-            if board.end == 0:
+            if end == 0:
                 self.inc('draws')
             else:
                 self.inc('mates')
-            return [], self.evaluate(board)
+            return self.evaluate(board)
 
         if depth <= 0:
             self.inc('leaves')
-            return [], self.evaluate(board)
+            return self.evaluate(board)
 
         bestscore = INF+1
-        bestmove = []
+        bestmove = None
         for m in board.moves:
             board.push(m)
-            moves, score = self.max_level(board, depth-1)
+            score = self.max_level(board, depth-1, ply+1)
             board.pop()
-            if not bestmove or score < bestscore:
+            if bestmove is None or score < bestscore:
                 bestscore = score
-                bestmove = [m] + moves
-        return bestmove, bestscore
-
-    def max_level(self, board: ChessBoard, depth:int):
-        self.inc('nodes')
-        if board.end is not None:
+                bestmove = m
+                self._pv.update(ply, m)
+        return bestscore
+
+    def max_level(self, board: ChessBoard, depth: int, ply=0):
+        self._nodes += 1
+        self._pv.clear(ply)
+        end = board.end
+        if end is not None:
             self.inc('leaves')
-            if board.end == 0:
+            if end == 0:
                 self.inc('draws')
             else:
                 self.inc('mates')
-            return [], self.evaluate(board)
+            return self.evaluate(board)
 
         if depth <= 0:
             self.inc('leaves')
-            return [], self.evaluate(board)
+            return self.evaluate(board)
 
         bestscore = -INF-1
-        bestmove = []
+        bestmove = None
         for m in board.moves:
             board.push(m)
-            moves, score = self.min_level(board, depth-1)
+            score = self.min_level(board, depth-1, ply+1)
             board.pop()
-            if not bestmove or score > bestscore:
+            if bestmove is None or score > bestscore:
                 bestscore = score
-                bestmove = [m] + moves
-        return bestmove, bestscore
+                bestmove = m
+                self._pv.update(ply, m)
+        return bestscore
 
     def search(self, board:ChessBoard, depth:int):
         if board.turn:
@@ -71,7 +79,8 @@ class MinimaxEngine(Engine):
 
     def choose(self, board):
         self.initcounter()
-        pv, score = self.search(board, self._maxdepth)
+        score = self.search(board, self._maxdepth)
+        pv = self._pv.pv()
 
         self.showstats(pv, score)
 
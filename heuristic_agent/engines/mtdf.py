@@ -0,0 +1,81 @@
+from typing import List, Tuple
+
+import chess
+
+from heuristic_agent.env.board import ChessBoard
+from heuristic_agent.env.eval import INF
+from heuristic_agent.engines.alphabeta_cached_iterdeep import ABIterDeepEngine
+
+
+class MTDfEngine(ABIterDeepEngine):
+    """
+    MTD(f): every iteration converges on the score with a series of null-window searches, starting from the
+    score of the previous iteration of the same parity, as the scores of odd and even depths differ by the
+    tempo of the side to move. Each pass only proves a bound, the transposition table keeps the bounds
+    of the previous passes so that the next ones search mostly the part of the tree that changes
+    https://www.chessprogramming.org/MTD(f)
+    """
+    FORMAT_STAT = (
+            '[depth: {depth}] score: {score} [time: {time:0.3f}s, pv: {pv}]\n' +
+            'nps: {nps}, nodes: {nodes}, qnodes: {qnodes}, betacuts: {betacuts}, passes: {passes}\n' +
+            'hits: {hits}, leaves: {leaves}, draws: {draws}, mates: {mates}'
+    )
+
+    # distance from the bound of the window of the second pass failing on the same side, doubled at every pass
+    STEP = 8
+
+    def __init__(self, maxdepth=4, ordering='cache', maxitems=1024000, **kwargs):
+        super(MTDfEngine, self).__init__(maxdepth, ordering, maxitems, **kwargs)
+        # null-window passes and score of every completed iteration
+        self._passes = []
+        self._scores = []
+
+    def initcounter(self):
+        super(MTDfEngine, self).initcounter()
+        self._counters['passes'] = 0
+
+    def _search_iteration(self, board: ChessBoard, depth: int, score) -> Tuple[List[chess.Move], int]:
+        if depth == 1:
+            self._passes = []
+            self._scores = []
+        if len(self._scores) >= 2:
+            guess = self._scores[-2]
+        elif score is not None:
+            guess = score
+        else:
+            guess = self.evaluate(board)
+        lower, upper = -INF, INF
+        beta = guess
+        step = 0
+        failed_low = None
+        pv = None
+        passes = 0
+        while lower < upper:
+            guess = self.search(board, depth, 0, beta - 1, beta)
+            passes += 1
+            # passes failing on the same side move the window further and further from the bound
+            step = (step * 2 or self.STEP) if failed_low is (guess < beta) else 0
+            failed_low = guess < beta
+            if failed_low:
+                upper = guess
+                beta = max(guess - step, lower + 1)
+            else:
+                lower = guess
+                beta = min(guess + 1 + step, upper)
+                pv = self._pv.pv()
+        if pv is None:
+            # every pass failed low, down to the score of a lost position
+            pv = self._pv.pv()
+        self._counters['passes'] = passes
+        self._passes.append(passes)
+        self._scores.append(guess)
+        return pv, guess
+
+    @property
+    def stats(self):
+        stats = super(MTDfEngine, self).stats
+        stats['passesperdepth'] = list(self._passes)
+        return stats
+
+    def __str__(self):
+        return 'MTDf(max_depth=%s)' % self._maxdepth
@@ -1,10 +1,9 @@
-from typing import Tuple, List
-
 import chess
 
 from heuristic_agent.env.board import ChessBoard
 from heuristic_agent.env.eval import INF
 from heuristic_agent.engines.greedy import GreedyEngine
+from heuristic_agent.enhancements.pv_table import PVTable
 
 
 class NegamaxEngine(GreedyEngine):
@@ -13,51 +12,56 @@ class NegamaxEngine(GreedyEngine):
             'nps: {nps}, nodes: {nodes}, leaves: {leaves}, draws: {draws}, mates: {mates}'
     )
 
-    def __init__(self, maxdepth=2):
-        super().__init__()
+    def __init__(self, maxdepth=2, **kwargs):
+        super().__init__(**kwargs)
         self._maxdepth = int(maxdepth)
+        self._pv = PVTable(self._maxdepth)
 
     def choose(self, board) -> chess.Move:
         self.initcounter()
-        pv, score = self.search(board, self._maxdepth)
+        score = self.search(board, self._maxdepth)
+        pv = self._pv.pv()
 
         self.showstats(pv, score)
 
         return pv[0]
 
-    def search(self, board: ChessBoard, depth: int, ply=0) -> Tuple[List[chess.Move], int]:
+    def search(self, board: ChessBoard, depth: int, ply=0) -> int:
         """
         Search best move from the current board state using negamax implementation
         :param board: representation of board
         :param depth: depth left to search
         :param ply: number of depth (half-move) already searched
-        :return: sequence of moves to go from the current board to the best found and the corresponding score
+        :return: score of the best move, the sequence of moves leading to it is left in the PV table at ply
         """
-        self.inc('nodes')
+        self._nodes += 1
+        self._pv.clear(ply)
 
-        if board.end is not None:
+        end = board.end
+        if end is not None:
             self.inc('leaves')
-            if board.end == 0:
+            if end == 0:
                 self.inc('draws')
             else:
                 self.inc('mates')
-            return [], -self.evaluate(board)
+            return -self.evaluate(board)
 
         if depth <= 0:
             self.inc('leaves')
-            return [], -self.evaluate(board)
+            return -self.evaluate(board)
 
-        bestmove = []
+        bestmove = None
         bestscore = -INF
         for m in board.moves:
             board.push(m)
-            nextmoves, score = self.search(board, depth - 1, ply + 1)
+            score = self.search(board, depth - 1, ply + 1)
             board.pop()
-            if not bestmove or score >= bestscore:
+            if bestmove is None or score >= bestscore:
                 bestscore = score
-                bestmove = [m] + nextmoves
+                bestmove = m
+                self._pv.update(ply, m)
 
-        return bestmove, -bestscore
+        return -bestscore
 
     def endscore(self, board, ply):
         self.inc('leaves')
@@ -65,7 +69,7 @@ class NegamaxEngine(GreedyEngine):
             self.inc('draws')
         else:
             self.inc('mates')
-        return [], -(self.evaluate(board) - ply * (1 if board.turn else -1))
+        return -(self.evaluate(board) - ply * (1 if board.turn else -1))
 
     def __str__(self):
         return 'Negamax(%s)' % self._maxdepth
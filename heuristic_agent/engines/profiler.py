@@ -0,0 +1,116 @@
+"""
+Sampling profiler attributing the CPU time of the searches to their phases
+"""
+import os
+import signal
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import chess
+
+PHASES = ('search', 'movegen', 'makemove', 'ordering', 'evaluation', 'ttprobe', 'ttstore', 'terminal')
+
+# phase of the functions of the package, by module and function name ('*' for the rest of the module);
+# the other functions count in the phase of their caller
+_MODULE_PHASES = {
+    'moveordering': {'*': 'ordering'},
+    'see': {'*': 'ordering'},
+    'history': {'*': 'ordering'},
+    'killer_moves': {'*': 'ordering'},
+    'eval': {'*': 'evaluation'},
+    'eval_cache': {'*': 'evaluation'},
+    'transposition_table': {'retrieve': 'ttprobe', 'lookup': 'ttprobe', 'put': 'ttstore'},
+    'board': {'push': 'makemove', 'pop': 'makemove', 'make': 'makemove', 'unmake': 'makemove',
+              'end': 'terminal', '_compute_end': 'terminal', '_is_fivefold_repetition': 'terminal',
+              'moves': 'movegen', 'legality_check': 'movegen'},
+    'engines': {'*': 'search'},
+}
+# phase of the python-chess functions called by the search itself
+_CHESS_PHASES = {'push': 'makemove', 'pop': 'makemove'}
+
+_PACKAGE = os.path.dirname(os.path.abspath(__file__)).rsplit(os.sep, 1)[0]
+_CHESS = os.path.dirname(os.path.abspath(chess.__file__))
+_IS_CHESS = object()
+# phase of every code object met, _IS_CHESS for python-chess and None for the functions without a phase
+_code_phases = {}
+
+
+def _code_phase(code):
+    filename = code.co_filename
+    if filename.startswith(_CHESS):
+        return _IS_CHESS
+    if not filename.startswith(_PACKAGE):
+        return None
+    phases = _MODULE_PHASES.get(os.path.splitext(os.path.basename(filename))[0])
+    if phases is None and os.path.basename(os.path.dirname(filename)) == 'engines':
+        phases = _MODULE_PHASES['engines']
+    if phases is None:
+        return None
+    return phases.get(code.co_name, phases.get('*'))
+
+
+def _phase(frame) -> Optional[str]:
+    """
+    Phase of the innermost function of the package having one on the stack; python-chess functions count in
+    the phase of the function calling them, or as move generation when called by the search itself.
+    None if no search is running
+    """
+    chess_name = None
+    while frame is not None:
+        code = frame.f_code
+        try:
+            phase = _code_phases[code]
+        except KeyError:
+            phase = _code_phases[code] = _code_phase(code)
+        if phase is _IS_CHESS:
+            # the outermost python-chess function, the one called from the package
+            chess_name = code.co_name
+        elif phase == 'search' and chess_name is not None:
+            return _CHESS_PHASES.get(chess_name, 'movegen')
+        elif phase is not None:
+            return phase
+        frame = frame.f_back
+    return None
+
+
+class SearchProfiler(object):
+    """
+    Sample the stack of the main thread every interval seconds of CPU time (SIGPROF), and count the samples
+    falling in every phase of the search. The search itself is not instrumented: nothing is paid when the
+    profiler is stopped, and each sample costs a walk up the stack
+    """
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.samples = dict.fromkeys(PHASES, 0)
+        self._running = False
+        self._previous = None
+
+    def _sample(self, signum, frame):
+        phase = _phase(frame)
+        if phase is not None:
+            self.samples[phase] += 1
+
+    def start(self):
+        """
+        Reset the samples and start sampling. Only possible from the main thread, on platforms with setitimer
+        """
+        self.samples = dict.fromkeys(PHASES, 0)
+        if not self._running:
+            self._previous = signal.signal(signal.SIGPROF, self._sample)
+            self._running = True
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        if not self._running:
+            return
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self._previous)
+        self._running = False
+
+    def breakdown(self) -> Dict[str, Dict]:
+        """
+        :return: estimated CPU time in seconds, number of samples and share of the samples of every phase
+        """
+        total = sum(self.samples.values())
+        return OrderedDict((phase, {'time': n * self.interval, 'samples': n, 'share': n / total if total else 0.})
+                           for phase, n in self.samples.items())
@@ -0,0 +1,120 @@
+"""
+Sinks receiving a record of every search, or of every iteration of the iterative deepening engines.
+A record is a flat dict: engine, depth, score, pv, nodes, qnodes, nps, tthitrate, betacuts, firstcutrate,
+ebf (effective branching factor) and time, see Engine.telemetry_record
+"""
+import abc
+import collections
+import json
+import os
+import tempfile
+from typing import Deque, Dict, IO, Optional, Union
+
+
+class TelemetrySink(abc.ABC):
+    @abc.abstractmethod
+    def emit(self, record: Dict):
+        pass
+
+    def close(self):
+        pass
+
+
+class MemorySink(TelemetrySink):
+    """
+    Keep the records in memory, the maxlen most recent ones if maxlen is set
+    """
+    def __init__(self, maxlen: Optional[int] = None):
+        self.records: Deque[Dict] = collections.deque(maxlen=maxlen)
+
+    def emit(self, record: Dict):
+        self.records.append(record)
+
+    def clear(self):
+        self.records.clear()
+
+
+class JsonLinesSink(TelemetrySink):
+    """
+    Append every record as a line of JSON to a file, flushed after every record
+    """
+    def __init__(self, file: Union[str, IO]):
+        """
+        :param file: path of the file, opened in append mode, or a file object which is not closed by close
+        """
+        self._owned = isinstance(file, str)
+        self._file = open(file, 'a') if self._owned else file
+
+    def emit(self, record: Dict):
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._owned:
+            self._file.close()
+
+
+class PrometheusSink(TelemetrySink):
+    """
+    Rewrite a file in the Prometheus text format with the numeric fields of the last record of every engine
+    as gauges, along with the total number of records and nodes as counters, for the textfile collector of
+    the node exporter. The file is replaced atomically so that it is never read half written
+    """
+    HELP = {
+        'depth': 'Depth of the last search',
+        'score': 'Score of the last search, in centipawns for the side to move',
+        'nodes': 'Nodes of the last search',
+        'qnodes': 'Quiescence nodes of the last search',
+        'nps': 'Nodes per second of the last search',
+        'tthitrate': 'Share of the transposition table probes of the last search with a usable entry',
+        'betacuts': 'Beta cutoffs of the last search',
+        'firstcutrate': 'Share of the beta cutoffs of the last search produced by the first move',
+        'ebf': 'Effective branching factor of the last search',
+        'time_seconds': 'Duration of the last search',
+    }
+
+    def __init__(self, path: str, prefix='heuristic_agent_search'):
+        self.path = path
+        self.prefix = prefix
+        # last record, number of records and of nodes by engine
+        self._last: Dict[str, Dict] = collections.OrderedDict()
+        self._records = collections.Counter()
+        self._nodes = collections.Counter()
+
+    @staticmethod
+    def _label(value: str) -> str:
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    def emit(self, record: Dict):
+        engine = str(record.get('engine', ''))
+        self._last[engine] = record
+        self._records[engine] += 1
+        self._nodes[engine] += record.get('nodes') or 0
+        self._write()
+
+    def _metric(self, lines, name, kind, help, values):
+        lines.append('# HELP {}_{} {}'.format(self.prefix, name, help))
+        lines.append('# TYPE {}_{} {}'.format(self.prefix, name, kind))
+        for engine, value in values:
+            lines.append('{}_{}{{engine="{}"}} {}'.format(self.prefix, name, self._label(engine), value))
+
+    def _write(self):
+        lines = []
+        for name, help in self.HELP.items():
+            field = 'time' if name == 'time_seconds' else name
+            values = [(engine, float(record[field])) for engine, record in self._last.items()
+                      if isinstance(record.get(field), (int, float))]
+            if values:
+                self._metric(lines, name, 'gauge', help, values)
+        self._metric(lines, 'searches_total', 'counter', 'Searches and iterations recorded', self._records.items())
+        self._metric(lines, 'nodes_total', 'counter', 'Nodes of the searches recorded', self._nodes.items())
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(self.path))
+        try:
+            with os.fdopen(fd, 'w') as file:
+                file.write('\n'.join(lines) + '\n')
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
@@ -0,0 +1,83 @@
+from array import array
+from operator import attrgetter
+from typing import Callable
+
+from heuristic_agent.env.board import ChessBoard
+
+SCORE_BITS = 24
+SCORE_MASK = (1 << SCORE_BITS) - 1
+SCORE_OFFSET = 1 << (SCORE_BITS - 1)
+# set in every stored entry, so that an empty word never matches a key (e.g. the pawnkey 0 of pawnless positions)
+VALID_BIT = 1 << SCORE_BITS
+CHECK_MASK = ~((VALID_BIT << 1) - 1)
+ENTRY_SIZE = 8
+
+
+class EvalCache:
+    """
+    Fixed-size, two-way associative cache in front of an evaluation function, keyed by a Zobrist key of the board
+    (by default the key of the whole position, hashkey).
+
+    Every entry is a single 64-bit word: the upper bits of the key to verify the hit, VALID_BIT and the score in
+    the lower SCORE_BITS bits. The table is allocated once, so memory never grows past the budget.
+    As the key ignores the move history, positions only drawn by repetition share the entry of the same position
+    reached without repetition.
+    """
+
+    def __init__(self, evaluate: Callable[[ChessBoard], int], size_mb=16, key='hashkey'):
+        """
+        :param evaluate: the evaluation function to cache
+        :param size_mb: memory budget of the table in megabytes
+        :param key: name of the board attribute holding the key, the cached function may only depend on
+            what this key identifies (e.g. 'pawnkey' for pawn structure terms)
+        """
+        nb_entries = 2
+        while nb_entries * 2 * ENTRY_SIZE <= size_mb * 1024 * 1024:
+            nb_entries *= 2
+        self.evaluate = evaluate
+        self._key = attrgetter(key)
+        self._table = array('Q', bytes(nb_entries * ENTRY_SIZE))
+        self._mask = nb_entries // 2 - 1
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hitrate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.
+
+    @property
+    def size(self) -> int:
+        """Number of entries"""
+        return len(self._table)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._table) * self._table.itemsize
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self._table = array('Q', bytes(self.nbytes))
+        self.reset_stats()
+
+    def __call__(self, board: ChessBoard) -> int:
+        key = self._key(board)
+        check = (key & CHECK_MASK) | VALID_BIT
+        slot = (key & self._mask) << 1
+        table = self._table
+        entry = table[slot]
+        if entry & ~SCORE_MASK != check:
+            entry = table[slot + 1]
+        if entry & ~SCORE_MASK == check:
+            self.hits += 1
+            return (entry & SCORE_MASK) - SCORE_OFFSET
+
+        self.misses += 1
+        score = self.evaluate(board)
+        # the newest entry goes first, the one it replaces is kept in the second way
+        table[slot + 1] = table[slot]
+        table[slot] = check | (score + SCORE_OFFSET)
+        return score
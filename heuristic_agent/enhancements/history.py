@@ -0,0 +1,64 @@
+from typing import List, Optional
+
+import numpy as np
+from chess import Move
+
+
+class HistoryTable:
+    """
+    History heuristic: score of the quiet moves by side, from square and to square, raised by depth * depth
+    every time the move produces a beta cutoff. Scores are halved at every new search, and whenever one of
+    them exceeds MAX, so that recent cutoffs weigh more than old ones
+    https://www.chessprogramming.org/History_Heuristic
+    """
+    MAX = 1 << 24
+
+    def __init__(self):
+        self.table = np.zeros((2, 64, 64), dtype=np.int32)
+
+    def clear(self):
+        self.table.fill(0)
+
+    def age(self):
+        self.table >>= 1
+
+    def update(self, color: bool, move: Move, depth: int):
+        table = self.table[int(color)]
+        score = table.item(move.from_square, move.to_square) + depth * depth
+        table[move.from_square, move.to_square] = score
+        if score > self.MAX:
+            self.age()
+
+    def score(self, color: bool, move: Move) -> int:
+        return self.table[int(color)].item(move.from_square, move.to_square)
+
+    def sort(self, color: bool, moves: List[Move]) -> List[Move]:
+        """
+        Sort the moves by decreasing history score, moves of equal scores keep their order
+        """
+        if len(moves) <= 1:
+            return moves
+        scores = self.table[int(color)][[m.from_square for m in moves], [m.to_square for m in moves]]
+        return [moves[i] for i in np.argsort(-scores, kind='stable')]
+
+
+class CounterMoves:
+    """
+    Countermove heuristic: the quiet move that last produced a beta cutoff in reply to a move,
+    indexed by the from and to squares of that move
+    https://www.chessprogramming.org/Countermove_Heuristic
+    """
+    def __init__(self):
+        self.table: List[Optional[Move]] = [None] * 64 * 64
+
+    def clear(self):
+        self.table = [None] * 64 * 64
+
+    def update(self, previous: Move, move: Move):
+        if previous:
+            self.table[previous.from_square * 64 + previous.to_square] = move
+
+    def get(self, previous: Move) -> Optional[Move]:
+        if not previous:
+            return None
+        return self.table[previous.from_square * 64 + previous.to_square]
@@ -1,5 +1,4 @@
-from typing import List, Deque
-from collections import deque
+from typing import List
 from chess import Move
 
 
@@ -7,22 +6,24 @@ class KillerMoves:
     def __init__(self, depth, nb_moves_store: int):
         self.nb_slots = nb_moves_store
         self.depth = depth
-        self.killers: List[Deque[Move]] = [deque([Move.null() for _ in range(self.nb_slots)])
-                                           for _ in range(self.depth+1)]
+        # the slots of ply p are killers[p * nb_slots:(p + 1) * nb_slots], the most recent killer first
+        self.killers: List[Move] = [Move.null()] * (self.nb_slots * (self.depth + 1))
 
     def insert_killer(self, move: Move, ply: int):
         if self.is_killer(move, ply):
             return
-        if not self.killers[ply][0]:
-            self.killers[ply][0] = move
-        else:
-            self.killers[ply].rotate(1)
-            self.killers[ply][0] = move
+        start = ply * self.nb_slots
+        killers = self.killers
+        killers[start + 1:start + self.nb_slots] = killers[start:start + self.nb_slots - 1]
+        killers[start] = move
 
     def get_killers(self, ply: int):
-        # return self.killers[ply]
-        for km in self.killers[ply]:
-            yield km
+        start = ply * self.nb_slots
+        return self.killers[start:start + self.nb_slots]
 
     def is_killer(self, move: Move, ply: int):
-        return move in self.killers[ply]
+        killers = self.killers
+        for i in range(ply * self.nb_slots, (ply + 1) * self.nb_slots):
+            if killers[i] == move:
+                return True
+        return False
@@ -4,11 +4,16 @@ import chess
 from chess import Move
 from typing import List, Tuple
 
+from heuristic_agent.enhancements.history import HistoryTable, CounterMoves
 from heuristic_agent.enhancements.killer_moves import KillerMoves
-from heuristic_agent.env.eval import INF, evaluate
+from heuristic_agent.enhancements.see import see, PIECE_VALUES
+from heuristic_agent.env.eval import INF, psqt_white
 from heuristic_agent.env.board import ChessBoard
 from heuristic_agent.enhancements.transposition_table import TranspositionTable
 
+# MVV_LVA[victim][attacker], indexed by piece type: most valuable victim first, then least valuable attacker
+MVV_LVA = [[10 * victim + 6 - attacker if victim else 0 for attacker in range(7)] for victim in range(7)]
+
 
 class MoveOrdering(object):
     def __init__(self, name='seq', tt: TranspositionTable=None, km: KillerMoves=None):
@@ -24,6 +29,10 @@ class MoveOrdering(object):
             raise NotImplemented()
         self._tt = tt
         self._km = km
+        self._ht = None
+        self._cm = None
+        # move of the principal variation by position key, see set_pv
+        self._pvmoves = {}
     
     def set_tt(self, tt: TranspositionTable):
         self._tt = tt
@@ -31,6 +40,22 @@ class MoveOrdering(object):
     def set_km(self, km: KillerMoves):
         self._km = km
 
+    def set_history(self, ht: HistoryTable, cm: CounterMoves = None):
+        self._ht = ht
+        self._cm = cm
+
+    def set_pv(self, board: ChessBoard, pv: List[Move]):
+        """
+        Search the moves of the principal variation first, in place of the hash move, in the positions
+        of the variation from the board
+        """
+        self._pvmoves = {}
+        for m in pv:
+            self._pvmoves[board.hashkey] = m
+            board.make(m)
+        for _ in pv:
+            board.unmake()
+
     def _order_seq(self, board: ChessBoard, ply: int):
         return board.moves
 
@@ -40,27 +65,88 @@ class MoveOrdering(object):
         return moves
 
     def _order_eval(self, board: ChessBoard, ply: int):
-        if not hasattr(self, 'evaluate'):
-            self.evaluate = evaluate
+        """
+        Order the moves by the static score of the position they lead to, each move is made and unmade
+        in place and scored from the incremental material and piece-square accumulators of the board
+        """
         moves = board.moves
         if len(moves) <= 1:
             return moves
-        # inefficacy, do not use
-        return sorted(moves,
-                      key=lambda m: -self.evaluate(board.move(m)),
-                      reverse=True)
+        sign = 1 if board.turn else -1
+        scores = {}
+        for m in moves:
+            board.make(m)
+            scores[m] = sign * psqt_white(board)
+            board.unmake()
+        return sorted(moves, key=scores.__getitem__, reverse=True)
 
     def _order_cache(self, board: ChessBoard, ply: int):
-        ttEntry = None if self._tt is None else self._tt.retrieve(board)
-        hash_move = None if not ttEntry else ttEntry.move
-        captures, non_captures = self.categorize_moves(board, hash_move)
-        captures = self.sort_mvv_lva(board, captures)
-        non_captures = self.sort_killer_moves(non_captures, ply)
-        if hash_move:
-            return [hash_move] + captures + non_captures
+        """
+        Staged move generation: PV move or Hash Move -> winning and equal captures (MVV-LVA) -> killer moves
+        -> countermove -> losing captures (SEE < 0) -> quiet moves (history heuristic).
+        A stage is only generated once the previous ones are exhausted, so that a cutoff on the hash move
+        or on a capture skips the generation of the quiet moves. Pseudo-legal moves are checked for legality
+        right before being yielded
+        """
+        is_legal = board.legality_check()
+        hash_move = self._pvmoves.get(board.hashkey) if self._pvmoves else None
+        if hash_move is None:
+            ttEntry = None if self._tt is None else self._tt.retrieve(board)
+            hash_move = None if not ttEntry else ttEntry.move
+        if hash_move and board.is_pseudo_legal(hash_move) and is_legal(hash_move):
+            yield hash_move
         else:
-            return captures + non_captures
+            hash_move = None
 
+        losing = []
+        piece_type_at = board.piece_type_at
+        for m in self.captures(board, is_legal):
+            if m == hash_move:
+                continue
+            # a capture of a piece at least as valuable as the capturing one cannot lose material
+            if PIECE_VALUES[piece_type_at(m.from_square)] > PIECE_VALUES[piece_type_at(m.to_square) or chess.PAWN] \
+                    and see(board, m) < 0:
+                losing.append(m)
+            else:
+                yield m
+
+        killers = []
+        if self._km is not None:
+            for m in self._km.get_killers(ply):
+                if m and m != hash_move and not board.is_capture(m) and board.is_pseudo_legal(m) and is_legal(m):
+                    killers.append(m)
+                    yield m
+
+        if self._cm is not None and board.move_stack:
+            m = self._cm.get(board.move_stack[-1])
+            if m and m != hash_move and m not in killers and not board.is_capture(m) and board.is_pseudo_legal(m) \
+                    and is_legal(m):
+                killers.append(m)
+                yield m
+
+        yield from losing
+
+        ep_square = board.ep_square
+        quiets = [m for m in board.generate_pseudo_legal_moves(to_mask=~board.occupied_co[not board.turn] & chess.BB_ALL)
+                  if not (m == hash_move or m in killers or m.to_square == ep_square and board.is_en_passant(m))]
+        if self._ht is not None:
+            quiets = self._ht.sort(board.turn, quiets)
+        for m in quiets:
+            if is_legal(m):
+                yield m
+
+    def captures(self, board: ChessBoard, is_legal=None):
+        """
+        Legal captures of the position ordered by MVV-LVA, generated from the capture masks only
+        :param board:
+        :param is_legal: the legality check of the position, see ChessBoard.legality_check
+        :return: generator of moves
+        """
+        if is_legal is None:
+            is_legal = board.legality_check()
+        for m in self.sort_mvv_lva(board, list(board.generate_pseudo_legal_captures())):
+            if is_legal(m):
+                yield m
 
     def order(self, board, ply=0) -> List[Move]:
         return self._order(board, ply=ply)
@@ -84,24 +170,10 @@ class MoveOrdering(object):
 
 
     def sort_mvv_lva(self, board: ChessBoard, capture_moves: List[Move]):
-        MVV_LVA_SCORE = [
-            [0, 0, 0, 0, 0, 0, 0],          #victim None, attacker K, Q, R, B, N, P, None
-            [10, 11, 12, 13, 14, 15, 0],    #victim P, attacker K, Q, R, B, N, P, None
-            [20, 21, 22, 23, 24, 25, 0],    #victim N, attacker K, Q, R, B, N, P, None
-            [30, 31, 32, 33, 34, 35, 0],    #victim B, attacker K, Q, R, B, N, P, None
-            [40, 41, 42, 43, 44, 45, 0],    #victim R, attacker K, Q, R, B, N, P, None
-            [50, 51, 52, 53, 54, 55, 0],    #victim Q, attacker K, Q, R, B, N, P, None
-            [60, 60, 60, 60, 60, 60, 60]    #victim K, attacker K, Q, R, B, N, P, None
-        ]
-        res = {}
-        for m in capture_moves:
-            try:
-                res[m] = MVV_LVA_SCORE[board.piece_at(m.to_square).piece_type][board.piece_at(m.from_square).piece_type]
-            except AttributeError:
-                if board.is_en_passant(m):
-                    victim = board.ep_square + 8 if not board.turn else board.ep_square - 8
-                    res[m] = MVV_LVA_SCORE[board.piece_at(victim).piece_type][board.piece_at(m.from_square).piece_type]
-        return sorted(res, key=res.get, reverse=True)
+        piece_type_at = board.piece_type_at
+        # the square of an en passant capture is empty, the victim is a pawn
+        return sorted(capture_moves, reverse=True,
+                      key=lambda m: MVV_LVA[piece_type_at(m.to_square) or chess.PAWN][piece_type_at(m.from_square)])
 
     def sort_killer_moves(self, non_captures: List[Move], ply: int):
         killers = []
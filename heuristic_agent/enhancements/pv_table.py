@@ -0,0 +1,39 @@
+from typing import List
+
+import chess
+
+
+class PVTable:
+    """
+    Triangular principal variation table: row ply holds, from index ply on, the best line found from the node
+    at this ply. A node clears its row when it is entered and, when a move improves its score, copies the row of
+    the child below its move, so that the search does not build a list of moves at every node
+    https://www.chessprogramming.org/Triangular_PV-Table
+    """
+    def __init__(self, maxply: int):
+        """
+        :param maxply: number of plies of the deepest search, the row of the leaves included
+        """
+        self.maxply = maxply
+        self.moves: List[List[chess.Move]] = [[chess.Move.null()] * (maxply + 1) for _ in range(maxply + 1)]
+        self.length = [0] * (maxply + 2)
+
+    def clear(self, ply: int):
+        self.length[ply] = ply
+
+    def set(self, ply: int, move: chess.Move):
+        """The line at ply is only the move, e.g. the move of a transposition table entry"""
+        self.moves[ply][ply] = move
+        self.length[ply] = ply + 1
+
+    def update(self, ply: int, move: chess.Move):
+        """The line at ply is the move followed by the line of the child searched last"""
+        row, child = self.moves[ply], self.moves[ply + 1]
+        row[ply] = move
+        length = self.length[ply + 1]
+        for i in range(ply + 1, length):
+            row[i] = child[i]
+        self.length[ply] = max(length, ply + 1)
+
+    def pv(self, ply=0) -> List[chess.Move]:
+        return self.moves[ply][ply:self.length[ply]]
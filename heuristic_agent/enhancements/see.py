@@ -0,0 +1,64 @@
+import chess
+
+from heuristic_agent.env.board import ChessBoard
+from heuristic_agent.env.eval import pieces
+
+# value of each piece type, indexed by piece_type (0 for no piece)
+PIECE_VALUES = [0] + [pieces[chess.piece_symbol(piece_type).upper()] for piece_type in chess.PIECE_TYPES]
+
+
+def _least_valuable(board: ChessBoard, attackers: int):
+    for piece_type in chess.PIECE_TYPES:
+        subset = attackers & board.pieces_mask(piece_type, chess.WHITE) | \
+                 attackers & board.pieces_mask(piece_type, chess.BLACK)
+        if subset:
+            return piece_type, subset & -subset
+    return None, 0
+
+
+def see(board: ChessBoard, move: chess.Move) -> int:
+    """
+    Static Exchange Evaluation: material won by the side to move when the move is played and every
+    piece attacking the target square recaptures, least valuable first, as long as it is profitable.
+    Sliders hidden behind a capturing piece (x-rays) join the exchange when it moves.
+    https://www.chessprogramming.org/Static_Exchange_Evaluation
+    :param board: position before the move
+    :param move: a capture, a promotion or any pseudo-legal move
+    :return: material balance of the exchange in centipawns, from the point of view of the side to move
+    """
+    from_square, to_square = move.from_square, move.to_square
+    occupied = board.occupied ^ chess.BB_SQUARES[from_square]
+    piece_type = board.piece_type_at(from_square)
+    captured = board.piece_type_at(to_square)
+    if piece_type == chess.PAWN and captured is None and to_square == board.ep_square:
+        captured = chess.PAWN
+        occupied ^= chess.BB_SQUARES[to_square - 8 if board.turn else to_square + 8]
+    gain = [PIECE_VALUES[captured or 0]]
+    if move.promotion:
+        piece_type = move.promotion
+        gain[0] += PIECE_VALUES[piece_type] - PIECE_VALUES[chess.PAWN]
+
+    color = not board.turn
+    attackers = (board.attackers_mask(chess.WHITE, to_square, occupied) |
+                 board.attackers_mask(chess.BLACK, to_square, occupied)) & occupied
+    while True:
+        side_attackers = attackers & board.occupied_co[color]
+        attacker_type, attacker = _least_valuable(board, side_attackers)
+        if not attacker:
+            break
+        # the piece standing on the square is captured, and the capturing piece may be captured in turn
+        gain.append(PIECE_VALUES[piece_type] - gain[-1])
+        piece_type = attacker_type
+        if piece_type == chess.KING and attackers & board.occupied_co[not color] & ~attacker:
+            # the king cannot capture into a defended square
+            gain.pop()
+            break
+        occupied ^= attacker
+        attackers = (board.attackers_mask(chess.WHITE, to_square, occupied) |
+                     board.attackers_mask(chess.BLACK, to_square, occupied)) & occupied
+        color = not color
+
+    # negamax the sequence of gains: each side may stop capturing when it does not pay off
+    for i in range(len(gain) - 1, 0, -1):
+        gain[i - 1] = -max(-gain[i - 1], gain[i])
+    return gain[0]
@@ -1,6 +1,13 @@
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
 from collections import namedtuple, OrderedDict
 from enum import Enum
-from typing import Tuple
+from multiprocessing import shared_memory, resource_tracker
+from typing import Tuple, Optional
 
 import chess
 
@@ -18,6 +25,18 @@ class Flag(Enum):
     UPPERBOUND = 3
 
 
+def bound(depth: int, score: int, alpha=-INF, beta=INF) -> Tuple[Flag, int]:
+    """
+    Flag of a search result with regard to the window it was searched with, and the score to store
+    """
+    if depth == 0 or alpha < score < beta:
+        return Flag.EXACT, score
+    elif score >= beta:
+        return Flag.LOWERBOUND, beta
+    else:
+        return Flag.UPPERBOUND, alpha
+
+
 class TranspositionTable:
 
     def __init__(self, maxitems=500000):
@@ -45,16 +64,7 @@ class TranspositionTable:
         if move is None:
             return
         key = board.hashkey
-        if depth == 0 or alpha < score < beta:
-            flag = Flag.EXACT
-        elif score >= beta:
-            flag = Flag.LOWERBOUND
-            score = beta
-        elif score <= alpha:
-            flag = Flag.UPPERBOUND
-            score = alpha
-        else:
-            assert False
+        flag, score = bound(depth, score, alpha, beta)
 
         entry = Entry(move, depth, score, flag)
         old_entry = self._cache.get(key, None)
@@ -99,10 +109,341 @@ class TranspositionTable:
         key = board.hashkey
         return self._cache.get(key, None)
 
+    def new_search(self):
+        pass
+
+    def hashfull(self) -> int:
+        """Permille of the table in use"""
+        return len(self._cache) * 1000 // self._maxitems
+
+
+# Layout of the data word of a BucketTranspositionTable entry
+_MOVE_BITS, _DEPTH_SHIFT, _FLAG_SHIFT, _GEN_SHIFT, _SCORE_SHIFT = 16, 16, 24, 26, 32
+_MOVE_MASK, _DEPTH_MASK, _FLAG_MASK, _GEN_MASK = (1 << _MOVE_BITS) - 1, 0xff, 0x3, 0x3f
+_SCORE_OFFSET = 1 << 31
+_FLAGS = tuple(Flag)
+
+# Header of a table saved to a file: magic, version of the format, entry layout, key of the starting position
+# (to detect another hashing scheme), byte order of the words, number of buckets and generation
+_FILE_MAGIC = b'HATT'
+_FILE_VERSION = 1
+_FILE_HEADER = struct.Struct('<4sIQQ8sQQ')
+_FILE_HEADER_SIZE = 64
+
+
+def encode_move(move: chess.Move) -> int:
+    """16-bit move: from square, to square and promotion piece type on 6, 6 and 4 bits"""
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def decode_move(move: int) -> chess.Move:
+    return chess.Move(move & 63, move >> 6 & 63, move >> 12 or None)
+
+
+class BucketTranspositionTable:
+    """
+    Transposition table preallocated from a memory budget, as an array of 64-bit words.
+
+    The table is split into buckets of SLOTS entries of two words: the Zobrist key xor the data, and a data word
+    packing the move on 16 bits, the depth on 8, the flag on 2, the generation on 6 and the score on 32.
+    Storing the key xor the data lets a reader detect an entry whose two words were not written together.
+    The first SLOTS - 1 slots of a bucket are depth-preferred, the last one is always replaced.
+    The generation is increased on every new search, so that entries left by the searches of earlier moves
+    are replaced first whatever their depth.
+    """
+    SLOTS = 4
+    WORDS = 2 * SLOTS
+    AGE_WEIGHT = 8
+    _generation = 0
+
+    def __init__(self, size_mb=64):
+        """
+        :param size_mb: memory budget in megabytes, the number of buckets is the largest power of two fitting in it
+        """
+        bucket_size = self.WORDS * 8
+        nb_buckets = 1
+        while nb_buckets * 2 * bucket_size <= size_mb * 1024 * 1024:
+            nb_buckets *= 2
+        self._mask = nb_buckets - 1
+        self._table = self._allocate(nb_buckets * bucket_size)
+
+    def _allocate(self, nbytes: int):
+        return array('Q', bytes(nbytes))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._table) * self._table.itemsize
+
+    @classmethod
+    def _layout(cls) -> int:
+        return cls.SLOTS | _MOVE_BITS << 8 | _DEPTH_SHIFT << 16 | _FLAG_SHIFT << 24 | _GEN_SHIFT << 32 | \
+               _SCORE_SHIFT << 40
+
+    def save(self, path: str):
+        """
+        Write the table to a flat file, a header followed by the words of the table, that load_table maps back
+        """
+        header = _FILE_HEADER.pack(_FILE_MAGIC, _FILE_VERSION, self._layout(), ChessBoard().hashkey,
+                                   sys.byteorder.encode(), self._mask + 1, self._generation)
+        with open(path, 'wb') as file:
+            file.write(header.ljust(_FILE_HEADER_SIZE, b'\0'))
+            with memoryview(self._table).cast('B') as data:
+                file.write(data)
+
+    def new_search(self):
+        """Start a new generation, called before searching a new position"""
+        self._generation = (self._generation + 1) & _GEN_MASK
+
+    def _pack(self, move: chess.Move, depth: int, score: int, flag: Flag) -> int:
+        return encode_move(move) | min(depth, _DEPTH_MASK) << _DEPTH_SHIFT | flag.value << _FLAG_SHIFT | \
+               self._generation << _GEN_SHIFT | (score + _SCORE_OFFSET) << _SCORE_SHIFT
+
+    def _age(self, data: int) -> int:
+        return (self._generation - (data >> _GEN_SHIFT & _GEN_MASK)) & _GEN_MASK
+
+    def put(self,
+            board: ChessBoard,
+            move: chess.Move,
+            depth: int,
+            ply: int,
+            score: int,
+            alpha=-INF,
+            beta=INF):
+        """
+        Put an search entry into the table, same parameters as TranspositionTable.put
+        """
+        if move is None:
+            return
+        key = board.hashkey
+        flag, score = bound(depth, score, alpha, beta)
+        data = self._pack(move, depth, score, flag)
+
+        table = self._table
+        base = (key & self._mask) * self.WORDS
+        last = base + self.WORDS - 2
+        victim = victim_value = None
+        for i in range(base, last, 2):
+            old = table[i + 1]
+            if table[i] ^ old == key:
+                if self._age(old) or (old >> _DEPTH_SHIFT & _DEPTH_MASK) <= depth:
+                    table[i], table[i + 1] = key ^ data, data
+                return
+            value = (old >> _DEPTH_SHIFT & _DEPTH_MASK) - self.AGE_WEIGHT * self._age(old) if old else -INF
+            if victim is None or value < victim_value:
+                victim, victim_value = i, value
+
+        if victim_value <= depth:
+            if table[victim + 1]:
+                # the replaced entry is kept in the always-replace slot
+                table[last], table[last + 1] = table[victim], table[victim + 1]
+            elif table[last] ^ table[last + 1] == key:
+                table[last] = table[last + 1] = 0
+            table[victim], table[victim + 1] = key ^ data, data
+        else:
+            table[last], table[last + 1] = key ^ data, data
+
+    def retrieve(self, board) -> Optional[Entry]:
+        key = board.hashkey
+        table = self._table
+        base = (key & self._mask) * self.WORDS
+        for i in range(base, base + self.WORDS, 2):
+            data = table[i + 1]
+            if table[i] ^ data == key and data:
+                return Entry(decode_move(data & _MOVE_MASK),
+                             data >> _DEPTH_SHIFT & _DEPTH_MASK,
+                             (data >> _SCORE_SHIFT) - _SCORE_OFFSET,
+                             _FLAGS[data >> _FLAG_SHIFT & _FLAG_MASK])
+        return None
+
+    def lookup(self,
+               board: ChessBoard,
+               depth: int,
+               ply: int,
+               alpha=-INF,
+               beta=INF) -> Tuple[bool, chess.Move, int]:
+        entry = self.retrieve(board)
+        if entry is None:
+            return False, chess.Move.null(), 0
+        if entry.depth >= depth:
+            if entry.flag is Flag.EXACT:
+                return True, entry.move, entry.score
+            elif entry.flag is Flag.LOWERBOUND and entry.score >= beta:
+                return True, entry.move, beta
+            elif entry.flag is Flag.UPPERBOUND and entry.score <= alpha:
+                return True, entry.move, alpha
+        return False, entry.move, 0
+
+    def hashfull(self, sample=1000) -> int:
+        """Permille of the entries of the first buckets written during the current generation"""
+        table = self._table
+        words = min(sample * self.WORDS, len(table))
+        used = sum(1 for i in range(1, words, 2) if table[i] and not self._age(table[i]))
+        return used * 1000 // (words // 2)
+
+def _read_header(file, cls=BucketTranspositionTable) -> Tuple[int, int]:
+    """
+    Check the header of a file written by BucketTranspositionTable.save
+    :return: the number of buckets and the generation of the saved table
+    """
+    header = file.read(_FILE_HEADER_SIZE)
+    if len(header) < _FILE_HEADER_SIZE:
+        raise ValueError('%s is not a transposition table file' % file.name)
+    magic, version, layout, hash_check, byteorder, nb_buckets, generation = _FILE_HEADER.unpack_from(header)
+    if magic != _FILE_MAGIC:
+        raise ValueError('%s is not a transposition table file' % file.name)
+    if version != _FILE_VERSION or layout != cls._layout():
+        raise ValueError('%s was saved with another format (version %d, layout %x)' % (file.name, version, layout))
+    if hash_check != ChessBoard().hashkey:
+        raise ValueError('%s was saved with another hashing scheme' % file.name)
+    if byteorder.rstrip(b'\0').decode() != sys.byteorder:
+        raise ValueError('%s was saved on a machine of another byte order' % file.name)
+    size = os.fstat(file.fileno()).st_size
+    if nb_buckets & (nb_buckets - 1) or size != _FILE_HEADER_SIZE + nb_buckets * cls.WORDS * 8:
+        raise ValueError('%s is truncated or corrupted' % file.name)
+    return nb_buckets, generation
+
+
+def load_table(path: str, writeback=False) -> BucketTranspositionTable:
+    """
+    Map a table saved by BucketTranspositionTable.save, without reading nor parsing it: pages are loaded when
+    first probed, and processes loading the same file share them until they write to them.
+    :param path: file written by save
+    :param writeback: if True stores are written to the file, otherwise the mapping is copy-on-write
+    :raises ValueError: if the file was saved with another format, entry layout, hashing scheme or byte order
+    """
+    with open(path, 'r+b' if writeback else 'rb') as file:
+        nb_buckets, generation = _read_header(file)
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_WRITE if writeback else mmap.ACCESS_COPY)
+    table = BucketTranspositionTable.__new__(BucketTranspositionTable)
+    table._mask = nb_buckets - 1
+    table._table = memoryview(data)[_FILE_HEADER_SIZE:].cast('Q')
+    table._generation = generation
+    return table
+
+
+# names of the shared memory blocks created by this process
+_created_blocks = set()
+
+
+class SharedTranspositionTable(BucketTranspositionTable):
+    """
+    BucketTranspositionTable whose storage lives in a multiprocessing.shared_memory block, so that searches
+    running in several processes share their results.
+
+    The table is created by one process and attached by name from the others (or by pickling it, which
+    attaches on unpickling). Probes and stores take no lock: a torn entry, whose words were written by two
+    processes, fails the key xor data check and is read as a miss.
+    The generation is kept in the header of the block, so that new_search applies to every process.
+    The block is destroyed by unlink, or when the table of the creating process is garbage collected.
+    """
+    HEADER = 64
+
+    def __init__(self, size_mb=64, name: Optional[str] = None):
+        """
+        :param size_mb: memory budget in megabytes, used when the block is created
+        :param name: name of an existing block to attach to, a new block is created if None
+        """
+        self._shm = None
+        self._attach = name
+        self._inherited = False
+        self._owner = os.getpid() if name is None else None
+        super(SharedTranspositionTable, self).__init__(size_mb)
+
+    def _allocate(self, nbytes: int):
+        # header: generation, number of buckets
+        if self._attach is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=self.HEADER + nbytes)
+            _created_blocks.add(self._shm.name)
+            self._shm.buf[:self.HEADER] = bytes(self.HEADER)
+            self._header = self._shm.buf[:16].cast('Q')
+            self._header[1] = self._mask + 1
+        else:
+            self._shm = shared_memory.SharedMemory(name=self._attach)
+            if os.name == 'posix' and not self._inherited and self._attach not in _created_blocks:
+                # the block belongs to the process that created it, which unlinks it, while the resource tracker
+                # of this process would unlink it on exit
+                resource_tracker.unregister(self._shm._name, 'shared_memory')
+            self._header = self._shm.buf[:16].cast('Q')
+            self._mask = self._header[1] - 1
+            nbytes = self._header[1] * self.WORDS * 8
+        return self._shm.buf[self.HEADER:self.HEADER + nbytes].cast('Q')
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def _generation(self) -> int:
+        return self._header[0]
+
+    @_generation.setter
+    def _generation(self, generation: int):
+        self._header[0] = generation
+
+    def clear(self):
+        # only the entries: the header keeps the generation and the number of buckets read by attaching processes
+        self._shm.buf[self.HEADER:self.HEADER + self.nbytes] = bytes(self.nbytes)
+
+    def close(self):
+        """Detach from the block, the table cannot be used afterwards"""
+        if self._shm is not None:
+            self._table.release()
+            self._header.release()
+            self._shm.close()
+            self._shm = None
+
+    def __del__(self):
+        # the block is destroyed with the table of the process that created it
+        if self._owner == os.getpid():
+            self.unlink()
+        else:
+            self.close()
+
+    def unlink(self):
+        """Close and destroy the block, to be called once by the process that created it"""
+        shm = self._shm
+        if shm is not None:
+            self.close()
+            shm.unlink()
+            self._owner = None
+
+    @classmethod
+    def from_file(cls, path: str) -> 'SharedTranspositionTable':
+        """
+        Create a shared table holding a table saved by BucketTranspositionTable.save, to warm start the workers
+        :raises ValueError: if the file was saved with another format, entry layout, hashing scheme or byte order
+        """
+        with open(path, 'rb') as file:
+            nb_buckets, generation = _read_header(file, cls)
+            table = cls(nb_buckets * cls.WORDS * 8 / (1024 * 1024))
+            with table._table.cast('B') as data:
+                file.readinto(data)
+        table._generation = generation
+        return table
+
+    def __getstate__(self):
+        return {'name': self.name}
+
+    def __setstate__(self, state):
+        # unpickled in a child of multiprocessing, which shares the resource tracker of the creating process
+        self._inherited = True
+        self._owner = None
+        self._shm = None
+        self._attach = state['name']
+        BucketTranspositionTable.__init__(self)
+
 
 if __name__=="__main__":
     tt = TranspositionTable()
     tt.put(ChessBoard(), chess.Move.null(), 0, 1, 0)
     p = pickle.dumps(tt)
     load_tt = pickle.loads(p)
-    print(load_tt.lookup(ChessBoard(), 1, 0))
\ No newline at end of file
+    print(load_tt.lookup(ChessBoard(), 1, 0))
+
+    tt = BucketTranspositionTable(1)
+    tt.put(ChessBoard(), chess.Move.from_uci('e2e4'), 0, 1, 0)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tt.bin')
+        tt.save(path)
+        load_tt = load_table(path)
+        print(load_tt.lookup(ChessBoard(), 0, 0))
\ No newline at end of file
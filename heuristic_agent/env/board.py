@@ -1,21 +1,259 @@
-from typing import List
+from enum import Enum
+from typing import Callable, List, Optional, Tuple
 
 import chess
-from chess.polyglot import zobrist_hash
+from chess.polyglot import zobrist_hash, POLYGLOT_RANDOM_ARRAY, ZobristHasher
+
+_hasher = ZobristHasher(POLYGLOT_RANDOM_ARRAY)
+
+# Polyglot keys, laid out as in ZobristHasher.hash_board: piece index is (piece_type - 1) * 2 + color
+ZOBRIST_PIECES = [[[POLYGLOT_RANDOM_ARRAY[64 * ((piece_type - 1) * 2 + color) + sq] for sq in chess.SQUARES]
+                   for piece_type in chess.PIECE_TYPES]
+                  for color in (chess.BLACK, chess.WHITE)]
+ZOBRIST_EP = POLYGLOT_RANDOM_ARRAY[772:780]
+ZOBRIST_TURN = POLYGLOT_RANDOM_ARRAY[780]
+
+# Squares from which a pawn of the side to move could capture on the given en passant square
+_EP_CAPTURERS = [[0] * 64, [0] * 64]
+for _sq in chess.SQUARES:
+    _EP_CAPTURERS[chess.WHITE][_sq] = chess.shift_left(chess.shift_down(chess.BB_SQUARES[_sq])) | \
+                                      chess.shift_right(chess.shift_down(chess.BB_SQUARES[_sq]))
+    _EP_CAPTURERS[chess.BLACK][_sq] = chess.shift_left(chess.shift_up(chess.BB_SQUARES[_sq])) | \
+                                      chess.shift_right(chess.shift_up(chess.BB_SQUARES[_sq]))
+
+
+class _Lazy(Enum):
+    # members are pickled by name, so the sentinel keeps its identity in other processes
+    UNKNOWN = 0
+
+
+_UNKNOWN = _Lazy.UNKNOWN
+
+
+class UndoRecord:
+    """
+    What ChessBoard maintains on top of python-chess for one position of the move stack.
+    make/push appends a record and unmake/pop drops it, which restores the previous one in O(1).
+    moves and end are filled lazily the first time they are read for the position
+    """
+    __slots__ = ('key', 'castling_rights', 'castling_key', 'ep_key', 'psqt_mid', 'psqt_end', 'pawnkey',
+                 'moves', 'end')
+
+    def __init__(self, key, castling_rights, castling_key, ep_key, psqt_mid, psqt_end, pawnkey):
+        self.key = key
+        self.castling_rights = castling_rights
+        self.castling_key = castling_key
+        self.ep_key = ep_key
+        self.psqt_mid = psqt_mid
+        self.psqt_end = psqt_end
+        self.pawnkey = pawnkey
+        self.moves = None
+        self.end = _UNKNOWN
+
+
+def _psqt_delta(table, turn, piece_type, placed, from_square, to_square, captured, capture_square, rook_from, rook_to):
+    own = table[turn]
+    delta = own[placed - 1][to_square] - own[piece_type - 1][from_square]
+    if captured:
+        delta -= table[not turn][captured - 1][capture_square]
+    elif rook_from is not None:
+        delta += own[chess.ROOK - 1][rook_to] - own[chess.ROOK - 1][rook_from]
+    return delta
 
 
 class ChessBoard(chess.Board):
-    def __init__(self, *args):
-        super().__init__(*args)
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
         self.score = 0
+        self._psqt = None
 
     @property
     def moves(self) -> List[chess.Move]:
-        return list(self.legal_moves)
+        """
+        Legal moves of the position, generated once per position on the stack
+        """
+        if not self._states:
+            self._reset_state()
+        state = self._states[-1]
+        moves = state.moves
+        if moves is None:
+            moves = state.moves = list(self.generate_legal_moves())
+        return list(moves)
+
+    def legality_check(self) -> Callable[[chess.Move], bool]:
+        """
+        Return a predicate telling whether a pseudo-legal move of the current position is legal.
+        The king and the pinned pieces are computed once, so that the moves of a staged generation
+        can be checked one by one when they are about to be played
+        """
+        king = self.king(self.turn)
+        if king is None:
+            return lambda move: True
+        if self.is_check():
+            return set(self.moves).__contains__
+        blockers = self._slider_blockers(king)
+        is_safe = self._is_safe
+        return lambda move: is_safe(king, blockers, move)
 
     @property
     def hashkey(self):
-        return zobrist_hash(self)
+        """
+        Polyglot Zobrist key of the position, identical to zobrist_hash(self).
+        The key is maintained incrementally by push/pop and only recomputed from scratch
+        after the position was set up by other means (set_fen, set_piece_at, ...)
+        """
+        if not self._states:
+            self._reset_state()
+        return self._states[-1].key
+
+    @property
+    def pawnkey(self):
+        """
+        Zobrist key of the pawns only: the xor of the polyglot keys of every pawn, maintained like hashkey
+        """
+        if not self._states:
+            self._reset_state()
+        return self._states[-1].pawnkey
+
+    def track_psqt(self, psqt_mid, psqt_end):
+        """
+        Maintain middle-game and end-game piece-square accumulators on every push/pop
+        :param psqt_mid: table indexed by [color][piece_type - 1][square] holding the white-relative value of a piece
+        :param psqt_end: same as psqt_mid, used once the end game begins
+        """
+        self._psqt = (psqt_mid, psqt_end)
+        self._states = []
+
+    @property
+    def psqt(self) -> Optional[Tuple[int, int]]:
+        """
+        The (middle-game, end-game) accumulators, None if track_psqt has not been called
+        """
+        if self._psqt is None:
+            return None
+        if not self._states:
+            self._reset_state()
+        state = self._states[-1]
+        return state.psqt_mid, state.psqt_end
+
+    def _pawn_key(self):
+        key = 0
+        for color in chess.COLORS:
+            pawn_keys = ZOBRIST_PIECES[color][chess.PAWN - 1]
+            for square in chess.scan_forward(self.pieces_mask(chess.PAWN, color)):
+                key ^= pawn_keys[square]
+        return key
+
+    def _reset_state(self):
+        mid = end = 0
+        if self._psqt is not None:
+            psqt_mid, psqt_end = self._psqt
+            for color in chess.COLORS:
+                for piece_type in chess.PIECE_TYPES:
+                    for square in chess.scan_forward(self.pieces_mask(piece_type, color)):
+                        mid += psqt_mid[color][piece_type - 1][square]
+                        end += psqt_end[color][piece_type - 1][square]
+        self._states = [UndoRecord(zobrist_hash(self), self.castling_rights, _hasher.hash_castling(self),
+                                   self._ep_key(), mid, end, self._pawn_key())]
+
+    def _ep_key(self):
+        ep_square = self.ep_square
+        if ep_square is not None and _EP_CAPTURERS[self.turn][ep_square] & self.pawns & self.occupied_co[self.turn]:
+            return ZOBRIST_EP[ep_square & 7]
+        return 0
+
+    def push(self, move: chess.Move):
+        if not self._states:
+            self._reset_state()
+        state = self._states[-1]
+        key, rights, castling_key = state.key, state.castling_rights, state.castling_key
+        mid, end, pawnkey = state.psqt_mid, state.psqt_end, state.pawnkey
+        turn = self.turn
+
+        if move and not move.drop:
+            from_square = move.from_square
+            to_square = move.to_square
+            piece_type = self.piece_type_at(from_square)
+            placed = move.promotion or piece_type
+            captured = capture_square = None
+            rook_from = rook_to = None
+            if piece_type == chess.KING and self.is_castling(move):
+                rook_from = self._to_chess960(move).to_square
+                rank = chess.square_rank(from_square) * 8
+                if chess.square_file(rook_from) < chess.square_file(from_square):
+                    to_square, rook_to = rank + 2, rank + 3
+                else:
+                    to_square, rook_to = rank + 6, rank + 5
+            else:
+                captured = self.piece_type_at(to_square)
+                capture_square = to_square
+                if not captured and piece_type == chess.PAWN and to_square == self.ep_square \
+                        and (from_square ^ to_square) & 7:
+                    captured = chess.PAWN
+                    capture_square = to_square + (-8 if turn else 8)
+
+            own = ZOBRIST_PIECES[turn]
+            key ^= own[piece_type - 1][from_square] ^ own[placed - 1][to_square]
+            if captured:
+                key ^= ZOBRIST_PIECES[not turn][captured - 1][capture_square]
+                if captured == chess.PAWN:
+                    pawnkey ^= ZOBRIST_PIECES[not turn][chess.PAWN - 1][capture_square]
+            elif rook_from is not None:
+                key ^= own[chess.ROOK - 1][rook_from] ^ own[chess.ROOK - 1][rook_to]
+            if piece_type == chess.PAWN:
+                pawnkey ^= own[chess.PAWN - 1][from_square]
+                if placed == chess.PAWN:
+                    pawnkey ^= own[chess.PAWN - 1][to_square]
+
+            if self._psqt is not None:
+                psqt_mid, psqt_end = self._psqt
+                mid += _psqt_delta(psqt_mid, turn, piece_type, placed, from_square, to_square,
+                                   captured, capture_square, rook_from, rook_to)
+                end += _psqt_delta(psqt_end, turn, piece_type, placed, from_square, to_square,
+                                   captured, capture_square, rook_from, rook_to)
+
+        super().push(move)
+
+        key ^= ZOBRIST_TURN ^ state.ep_key
+        new_ep_key = self._ep_key()
+        key ^= new_ep_key
+        if self.castling_rights != rights:
+            rights = self.castling_rights
+            key ^= castling_key
+            castling_key = _hasher.hash_castling(self)
+            key ^= castling_key
+        self._states.append(UndoRecord(key, rights, castling_key, new_ep_key, mid, end, pawnkey))
+
+    def pop(self) -> chess.Move:
+        move = super().pop()
+        if len(self._states) > 1:
+            self._states.pop()
+        else:
+            self._states = []
+        return move
+
+    def clear_stack(self):
+        super().clear_stack()
+        self._states = []
+
+    def copy(self, *, stack=True):
+        board = super().copy(stack=stack)
+        keep = len(self.move_stack) if stack is True else int(stack)
+        board._psqt = self._psqt
+        board._states = self._states[-(keep + 1):]
+        return board
+
+    def make(self, move: chess.Move):
+        """
+        Apply the move in place, without copying the board; unmake reverts it
+        """
+        self.push(move)
+
+    def unmake(self) -> chess.Move:
+        """
+        Revert the last move applied by make (or push) in place
+        """
+        return self.pop()
 
     def move(self, move: chess.Move):
         b = self.copy()
@@ -28,14 +266,44 @@ class ChessBoard(chess.Board):
         return b
 
     @property
-    def end(self, claim_draw=False):
-        result = self.result(claim_draw=claim_draw)
-        if result == '1-0':
-            return 1
-        elif result == '0-1':
-            return -1
-        elif result == '1/2-1/2':
+    def end(self):
+        """
+        Result of the game without claiming draws: 1 if white won, -1 if black won, 0 for a draw, None otherwise.
+        Computed once per position on the stack, reusing the legal moves if they were already generated;
+        fivefold repetitions are detected on the Zobrist keys of the stack
+        """
+        if not self._states:
+            self._reset_state()
+        state = self._states[-1]
+        end = state.end
+        if end is _UNKNOWN:
+            end = state.end = self._compute_end(state)
+        return end
+
+    def _compute_end(self, state):
+        moves = state.moves
+        has_moves = bool(moves) if moves is not None else any(self.generate_legal_moves())
+        if not has_moves:
+            if self.is_check():
+                return -1 if self.turn else 1
             return 0
-        else:
-            return None
+        if self.is_insufficient_material() or self.halfmove_clock >= 150 or self._is_fivefold_repetition():
+            return 0
+        return None
 
+    def _is_fivefold_repetition(self):
+        plies = min(self.halfmove_clock, len(self.move_stack))
+        if plies < 16:
+            return False
+        states = self._states
+        if len(states) <= plies:
+            # the stack of keys does not reach the last irreversible move
+            return self.is_fivefold_repetition()
+        key = states[-1].key
+        count = 1
+        for i in range(3, plies + 2, 2):
+            if states[-i].key == key:
+                count += 1
+                if count >= 5:
+                    return True
+        return False
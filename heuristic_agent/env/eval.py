@@ -1,4 +1,7 @@
+from typing import Iterable
+
 import chess
+import numpy as np
 from chess import Move
 
 from heuristic_agent.env.board import ChessBoard
@@ -80,6 +83,36 @@ score_diff_end_kingside_castling = -pstable['KE'][chess.E1] - pstable['R'][chess
 score_diff_end_queenside_castling = -pstable['KE'][chess.E1] - pstable['R'][chess.A1] + pstable['KE'][chess.C1] + pstable['R'][chess.D1]
 
 
+def _piece_square_table(king_table: str):
+    """
+    Build the white-relative value of every piece on every square, material included, indexed by
+    [color][piece_type - 1][square], so that summing over the pieces of a board gives the same
+    material + piece-square score as evaluate_white
+    :param king_table: 'KM' or 'KE', the king table to use
+    :return:
+    """
+    table = [[None] * len(chess.PIECE_TYPES), [None] * len(chess.PIECE_TYPES)]
+    for piece_type in chess.PIECE_TYPES:
+        symbol = chess.piece_symbol(piece_type).upper()
+        if piece_type == chess.KING:
+            symbol, value = king_table, 0
+        else:
+            value = pieces[symbol]
+        table[chess.WHITE][piece_type - 1] = [value + pstable[symbol][sq] for sq in chess.SQUARES]
+        if piece_type == chess.KNIGHT:
+            # black knights are added, not subtracted, by the piece-square sum of evaluate_white
+            table[chess.BLACK][piece_type - 1] = [-value + pstable[symbol][chess.square_mirror(sq)]
+                                                  for sq in chess.SQUARES]
+        else:
+            table[chess.BLACK][piece_type - 1] = [-value - pstable[symbol][chess.square_mirror(sq)]
+                                                  for sq in chess.SQUARES]
+    return table
+
+
+psqt_mid = _piece_square_table('KM')
+psqt_end = _piece_square_table('KE')
+
+
 
 def evaluate_white(board: ChessBoard) -> int:
     """
@@ -154,6 +187,309 @@ def evaluate(board: ChessBoard):
     return eval
 
 
+def is_endgame(board: ChessBoard) -> bool:
+    """
+    Verify if the ending begins, it might be either:
+    1. Both sides have no queens
+    2. Every side which has a queen has additionally no other pieces or one minorpiece max
+    """
+    white, black = board.occupied_co[chess.WHITE], board.occupied_co[chess.BLACK]
+    wq = (board.queens & white).bit_count()
+    bq = (board.queens & black).bit_count()
+    if wq == bq == 0:
+        return True
+    minors = board.knights | board.bishops
+    if wq == 1:
+        wminors = (minors & white).bit_count()
+        if wminors == 1 or wminors + (board.rooks & white).bit_count() == 0:
+            return True
+    if bq == 1:
+        bminors = (minors & black).bit_count()
+        if bminors == 1 or bminors + (board.rooks & black).bit_count() == 0:
+            return True
+    return False
+
+
+def evaluate_white_incremental(board: ChessBoard) -> int:
+    """
+    Same score as evaluate_white, read from the piece-square accumulators the board maintains on push/pop.
+    The board starts tracking them on the first call
+    :param board:
+    :return:
+    """
+    if board.end is not None:
+        result = board.end
+        if result != 0:
+            return INF * result
+        else:
+            return 0
+    return psqt_white(board)
+
+
+def psqt_white(board: ChessBoard) -> int:
+    """
+    Material and piece-square score of evaluate_white read from the board accumulators,
+    without checking whether the game has ended
+    """
+    accumulators = board.psqt
+    if accumulators is None:
+        board.track_psqt(psqt_mid, psqt_end)
+        accumulators = board.psqt
+    mid, end = accumulators
+    return end if is_endgame(board) else mid
+
+
+def evaluate_incremental(board: ChessBoard):
+    eval = evaluate_white_incremental(board)
+    eval = eval if board.turn else -eval
+    board.score = eval
+    return eval
+
+
+# (2, 12, 64) tensor of psqt_mid / psqt_end, plane index is color * 6 + piece_type - 1
+psqt_tensor = np.array([[row for color in (chess.BLACK, chess.WHITE) for row in table[color]]
+                        for table in (psqt_mid, psqt_end)], dtype=np.int64)
+_PLANE_BN, _PLANE_BB, _PLANE_BR, _PLANE_BQ = 1, 2, 3, 4
+_PLANE_WN, _PLANE_WB, _PLANE_WR, _PLANE_WQ = 7, 8, 9, 10
+
+
+def pack_bitboards(boards: Iterable[chess.BaseBoard]) -> np.ndarray:
+    """
+    Pack the piece bitboards of the given boards into an (N, 12) uint64 array,
+    plane index is color * 6 + piece_type - 1 (black pieces first)
+    """
+    return np.array([[board.pieces_mask(piece_type, color)
+                      for color in (chess.BLACK, chess.WHITE) for piece_type in chess.PIECE_TYPES]
+                     for board in boards], dtype=np.uint64).reshape(-1, 12)
+
+
+def evaluate_white_batch(boards) -> np.ndarray:
+    """
+    Vectorized evaluate_white: expand the bitboards of all boards into (N, 12, 64) planes and compute
+    material, piece-square and king-phase selection with array operations
+    :param boards: sequence of ChessBoard
+    :return: int64 array of the white-relative scores, identical to [evaluate_white(b) for b in boards]
+    """
+    boards = list(boards)
+    packed = pack_bitboards(boards).astype('<u8')
+    planes = np.unpackbits(packed.view(np.uint8), axis=1, bitorder='little').reshape(-1, 12, 64)
+    mid, end = psqt_tensor.reshape(2, 12 * 64) @ planes.reshape(-1, 12 * 64).T.astype(np.int64)
+
+    counts = planes.sum(axis=2, dtype=np.int64)
+    wq, bq = counts[:, _PLANE_WQ], counts[:, _PLANE_BQ]
+    wminors = counts[:, _PLANE_WN] + counts[:, _PLANE_WB]
+    bminors = counts[:, _PLANE_BN] + counts[:, _PLANE_BB]
+    endgame = ((wq == 0) & (bq == 0)) | \
+              ((wq == 1) & ((wminors + counts[:, _PLANE_WR] == 0) | (wminors == 1))) | \
+              ((bq == 1) & ((bminors + counts[:, _PLANE_BR] == 0) | (bminors == 1)))
+    scores = np.where(endgame, end, mid)
+
+    for i, board in enumerate(boards):
+        result = board.end
+        if result is not None:
+            scores[i] = INF * result
+    return scores
+
+
+def evaluate_batch(boards) -> np.ndarray:
+    """
+    Vectorized evaluate, the scores are relative to the side to move of each board.
+    Unlike evaluate, board.score is left untouched
+    """
+    boards = list(boards)
+    turns = np.fromiter((board.turn for board in boards), dtype=bool, count=len(boards))
+    scores = evaluate_white_batch(boards)
+    return np.where(turns, scores, -scores)
+
+
+def _rank_byte_table(table):
+    """
+    Split a 64-entry table into 8 tables, one per rank, giving the sum of the table over every set bit of a byte
+    """
+    return [[sum(table[rank * 8 + file] for file in range(8) if byte >> file & 1) for byte in range(256)]
+            for rank in range(8)]
+
+
+def _piece_square_only(table, color, piece_type):
+    value = 0 if piece_type == chess.KING else pieces[chess.piece_symbol(piece_type).upper()]
+    return [v - value if color else v + value for v in table[color][piece_type - 1]]
+
+
+# piece-square tables without material, mirroring and sign already applied, split per rank for byte lookups
+pst_bytes = [[_rank_byte_table(_piece_square_only(psqt_mid, color, piece_type))
+              for piece_type in chess.PIECE_TYPES[:-1]]
+             for color in (chess.BLACK, chess.WHITE)]
+king_bytes_mid = [_rank_byte_table(_piece_square_only(psqt_mid, color, chess.KING))
+                  for color in (chess.BLACK, chess.WHITE)]
+king_bytes_end = [_rank_byte_table(_piece_square_only(psqt_end, color, chess.KING))
+                  for color in (chess.BLACK, chess.WHITE)]
+
+
+def _pst_sum(rank_tables, mask: int) -> int:
+    score = 0
+    for table in rank_tables:
+        if not mask:
+            break
+        score += table[mask & 255]
+        mask >>= 8
+    return score
+
+
+def evaluate_white_bitboard(board: ChessBoard) -> int:
+    """
+    Same score as evaluate_white computed on the integer masks of the board:
+    popcounts for material and per-rank byte lookups for the piece-square tables
+    :param board:
+    :return:
+    """
+    if board.end is not None:
+        result = board.end
+        if result != 0:
+            return INF * result
+        else:
+            return 0
+
+    white, black = board.occupied_co[chess.WHITE], board.occupied_co[chess.BLACK]
+    pawns, knights, bishops, rooks, queens = board.pawns, board.knights, board.bishops, board.rooks, board.queens
+    wp, bp = pawns & white, pawns & black
+    wn, bn = knights & white, knights & black
+    wb, bb = bishops & white, bishops & black
+    wr, br = rooks & white, rooks & black
+    wq, bq = queens & white, queens & black
+
+    nwn, nbn = wn.bit_count(), bn.bit_count()
+    nwb, nbb = wb.bit_count(), bb.bit_count()
+    nwr, nbr = wr.bit_count(), br.bit_count()
+    nwq, nbq = wq.bit_count(), bq.bit_count()
+    material = pieces['P'] * (wp.bit_count() - bp.bit_count()) + \
+               pieces['N'] * (nwn - nbn) + \
+               pieces['B'] * (nwb - nbb) + \
+               pieces['R'] * (nwr - nbr) + \
+               pieces['Q'] * (nwq - nbq)
+
+    wtables, btables = pst_bytes[chess.WHITE], pst_bytes[chess.BLACK]
+    score = material
+    for i, (wmask, bmask) in enumerate(((wp, bp), (wn, bn), (wb, bb), (wr, br), (wq, bq))):
+        score += _pst_sum(wtables[i], wmask) + _pst_sum(btables[i], bmask)
+
+    if (nwq == nbq == 0) or (
+            (nwq == 1 and (nwn + nwb + nwr == 0 or nwn + nwb == 1)) or
+            (nbq == 1 and (nbn + nbb + nbr == 0 or nbn + nbb == 1))
+    ):
+        king_tables = king_bytes_end
+    else:
+        king_tables = king_bytes_mid
+    kings = board.kings
+    score += _pst_sum(king_tables[chess.WHITE], kings & white) + _pst_sum(king_tables[chess.BLACK], kings & black)
+    return score
+
+
+def evaluate_bitboard(board: ChessBoard):
+    eval = evaluate_white_bitboard(board)
+    eval = eval if board.turn else -eval
+    board.score = eval
+    return eval
+
+
+# Pawn structure terms, per pawn
+DOUBLED_PAWN = -10
+ISOLATED_PAWN = -15
+PASSED_PAWN = [0, 5, 10, 20, 35, 60, 100, 0]  # by rank, from the pawn owner's side
+
+_FILE_A = 0x0101010101010101
+_NOT_FILE_A = ~_FILE_A & chess.BB_ALL
+_NOT_FILE_H = ~(_FILE_A << 7) & chess.BB_ALL
+
+
+def _north_fill(bb: int) -> int:
+    bb |= bb << 8
+    bb |= bb << 16
+    bb |= bb << 32
+    return bb & chess.BB_ALL
+
+
+def _south_fill(bb: int) -> int:
+    bb |= bb >> 8
+    bb |= bb >> 16
+    bb |= bb >> 32
+    return bb
+
+
+def _widen(bb: int) -> int:
+    return bb | (bb << 1 & _NOT_FILE_A) | (bb >> 1 & _NOT_FILE_H)
+
+
+def _files(bb: int) -> int:
+    """byte of the files holding at least one bit of bb"""
+    return _south_fill(bb) & 255
+
+
+def _pawn_terms(own: int) -> int:
+    """doubled and isolated penalties of a pawn set, passed pawns are scored by the caller"""
+    files = _files(own)
+    isolated_files = files & ~((files << 1) | (files >> 1))
+    score = DOUBLED_PAWN * (own.bit_count() - files.bit_count())
+    score += ISOLATED_PAWN * (own & (isolated_files * _FILE_A)).bit_count()
+    return score
+
+
+def evaluate_pawns_white(board: chess.BaseBoard) -> int:
+    """
+    Doubled, isolated and passed pawns computed with bitboard shifts, white-relative.
+    Only depends on the pawns of the board, hence can be memoized on board.pawnkey
+    :param board:
+    :return:
+    """
+    wp = board.pawns & board.occupied_co[chess.WHITE]
+    bp = board.pawns & board.occupied_co[chess.BLACK]
+
+    score = _pawn_terms(wp) - _pawn_terms(bp)
+    # squares in front of the opponent pawns, on their file and both adjacent files
+    black_front = _widen(_south_fill(bp >> 8))
+    white_front = _widen(_north_fill(wp << 8))
+    for square in chess.scan_forward(wp & ~black_front):
+        score += PASSED_PAWN[square >> 3]
+    for square in chess.scan_forward(bp & ~white_front):
+        score -= PASSED_PAWN[7 - (square >> 3)]
+    return score
+
+
+def with_pawn_structure(evaluate_white_fn, evaluate_pawns=evaluate_pawns_white):
+    """
+    Build a side-to-move evaluation adding the pawn structure terms to a white-relative evaluation
+    :param evaluate_white_fn: white-relative evaluation, e.g. evaluate_white
+    :param evaluate_pawns: pawn structure terms, usually evaluate_pawns_white memoized in a pawn hash table
+    :return:
+    """
+    def evaluate_with_pawns(board: ChessBoard):
+        eval = evaluate_white_fn(board)
+        if board.end is None:
+            eval += evaluate_pawns(board)
+        eval = eval if board.turn else -eval
+        board.score = eval
+        return eval
+    return evaluate_with_pawns
+
+
+EVALUATORS = {
+    'classic': (evaluate, evaluate_white),
+    'incremental': (evaluate_incremental, evaluate_white_incremental),
+    'bitboard': (evaluate_bitboard, evaluate_white_bitboard),
+}
+
+
+def get_evaluator(name='classic', white=False):
+    """
+    Return the evaluation backend registered under the given name
+    :param name: one of EVALUATORS
+    :param white: return the white-relative function instead of the side-to-move one
+    :return:
+    """
+    if name not in EVALUATORS:
+        raise ValueError('Unknown evaluation %r, expected one of %s' % (name, ', '.join(EVALUATORS)))
+    return EVALUATORS[name][1 if white else 0]
+
+
 # def eval_from_move(board: ChessBoard, move: Move):
 #     """
 #     Evaluate the board score after playing the move.
@@ -203,16 +203,15 @@ class TraditionalAgent:
         if alpha < stand_pat:
             alpha = stand_pat
 
-        for move in board.legal_moves:
-            if board.is_capture(move):
-                board.push(move)
-                score = -self._quiesce(board, -beta, -alpha)
-                board.pop()
+        for move in board.generate_legal_captures():
+            board.push(move)
+            score = -self._quiesce(board, -beta, -alpha)
+            board.pop()
 
-                if score >= beta:
-                    return beta
-                if score > alpha:
-                    alpha = score
+            if score >= beta:
+                return beta
+            if score > alpha:
+                alpha = score
         return alpha
 
     @staticmethod